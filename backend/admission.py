@@ -0,0 +1,144 @@
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from backend import config, metrics
+from backend.models.job import Job
+from backend.models.upload_reservation import UploadReservation
+
+logger = logging.getLogger(__name__)
+
+# Jobs que ocupan el presupuesto: encolados o en proceso
+ACTIVE_STATES = ("queued", "running")
+
+_admission_lock = threading.Lock()
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.limit = limit
+        self.retry_after = config.ADMISSION_RETRY_AFTER_SECONDS
+
+
+def usage_query(exclude_reservation: int = None):
+    # Jobs, bytes, jobs en proceso y uploads en curso por compañía, solo de las
+    # compañías con jobs activos o reservas vigentes (una fila por tabla)
+    jobs = (
+        select(
+            Job.company_name,
+            func.count(),
+            func.coalesce(func.sum(Job.bytes_received), 0),
+            func.coalesce(func.sum(case((Job.state == "running", 1), else_=0)), 0),
+            literal(0),
+        )
+        .where(Job.state.in_(ACTIVE_STATES))
+        .group_by(Job.company_name)
+    )
+    since = datetime.utcnow() - timedelta(seconds=config.ADMISSION_RESERVATION_SECONDS)
+    reservations = (
+        select(
+            UploadReservation.company_name,
+            func.count(),
+            func.coalesce(func.sum(UploadReservation.bytes_reserved), 0),
+            literal(0),
+            func.count(),
+        )
+        .where(UploadReservation.created_at >= since)
+        .group_by(UploadReservation.company_name)
+    )
+    if exclude_reservation is not None:
+        reservations = reservations.where(UploadReservation.id != exclude_reservation)
+    return union_all(jobs, reservations)
+
+
+def limits():
+    return {
+        "max_jobs": config.ADMISSION_MAX_JOBS,
+        "max_bytes": config.ADMISSION_MAX_BYTES,
+        "company_max_jobs": config.ADMISSION_COMPANY_MAX_JOBS,
+        "company_max_bytes": config.ADMISSION_COMPANY_MAX_BYTES,
+        "company_max_running": config.WORKER_COMPANY_MAX_RUNNING,
+    }
+
+
+def summarize(rows):
+    # Un upload en curso cuenta como un job en vuelo; uploading dice cuántos lo son
+    companies = {}
+    for company, jobs, size, running, uploading in rows:
+        usage = companies.setdefault(company, {"jobs": 0, "bytes": 0, "running": 0, "uploading": 0})
+        usage["jobs"] += jobs
+        usage["bytes"] += int(size)
+        usage["running"] += int(running)
+        usage["uploading"] += int(uploading)
+    return {
+        "jobs": sum(usage["jobs"] for usage in companies.values()),
+        "bytes": sum(usage["bytes"] for usage in companies.values()),
+        "running": sum(usage["running"] for usage in companies.values()),
+        "uploading": sum(usage["uploading"] for usage in companies.values()),
+        "companies": companies,
+    }
+
+
+def _over(limit: int, used: int, amount: int):
+    # 0 desactiva el límite. Un archivo más grande que el presupuesto de bytes se
+    # admite cuando no hay nada en vuelo: de otro modo no entraría nunca
+    return limit > 0 and used > 0 and used + amount > limit
+
+
+@contextmanager
+def admission_lock(db: Session):
+    # Serializa las admisiones hasta el commit que inserta la reserva o el job. En
+    # PostgreSQL vale entre instancias de la API; en otros motores, dentro del proceso.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext('job_admission'))"))
+        yield
+        return
+    with _admission_lock:
+        yield
+
+
+def admit(db: Session, company_name: str, size: int, reservation_id: int = None):
+    # Comprueba el presupuesto global y el de la compañía. Se llama dentro de
+    # admission_lock y el llamador confirma la reserva o el job en la misma
+    # transacción. La reserva propia del request (reservation_id) no se cuenta.
+    usage = summarize(db.execute(usage_query(reservation_id)).all())
+    company = usage["companies"].get(company_name, {"jobs": 0, "bytes": 0})
+    checks = (
+        ("max_jobs", config.ADMISSION_MAX_JOBS, usage["jobs"], 1, "jobs in flight"),
+        ("company_max_jobs", config.ADMISSION_COMPANY_MAX_JOBS, company["jobs"], 1, f"jobs in flight for {company_name}"),
+        ("max_bytes", config.ADMISSION_MAX_BYTES, usage["bytes"], size, "bytes in flight"),
+        ("company_max_bytes", config.ADMISSION_COMPANY_MAX_BYTES, company["bytes"], size, f"bytes in flight for {company_name}"),
+    )
+    for name, limit, used, amount, what in checks:
+        if _over(limit, used, amount):
+            metrics.ADMISSIONS_REJECTED.labels(name).inc()
+            logger.warning(f"Upload rejected for company: {company_name}: {used} {what}, limit {limit}")
+            raise AdmissionRejected(f"Too many {what} ({used}, limit {limit}); retry later", name)
+    return usage
+
+
+def reserve(db: Session, company_name: str, size: int):
+    # Al empezar un upload, antes de leer el cuerpo: rechaza según Content-Length
+    # y reserva el presupuesto mientras llegan los bloques. Devuelve el id de la reserva.
+    with admission_lock(db):
+        since = datetime.utcnow() - timedelta(seconds=config.ADMISSION_RESERVATION_SECONDS)
+        db.execute(delete(UploadReservation).where(UploadReservation.created_at < since))
+        try:
+            admit(db, company_name, size)
+        except AdmissionRejected:
+            db.rollback()
+            raise
+        reservation = UploadReservation(company_name=company_name, bytes_reserved=size)
+        db.add(reservation)
+        db.commit()
+    return reservation.id
+
+
+def release(db: Session, reservation_id: int):
+    # Al encolar el job (en su transacción) o al terminar el request; el llamador confirma
+    db.execute(delete(UploadReservation).where(UploadReservation.id == reservation_id))
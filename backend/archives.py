@@ -0,0 +1,137 @@
+import io
+import os
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from backend import config, metrics
+from backend.pipeline import detect_file_type, iter_batches
+from backend.schemas import DEFAULT_SCHEMA
+
+# Tipos de job que agrupan varios archivos: un .zip, un .tar(.gz) o varias partes del form
+ARCHIVE_SUFFIXES = ((".tar.gz", "tar"), (".tgz", "tar"), (".tar", "tar"), (".zip", "zip"))
+ARCHIVE_CONTENT_TYPES = {
+    "application/zip": "zip", "application/x-zip-compressed": "zip",
+    "application/gzip": "tar", "application/x-gzip": "tar", "application/x-tar": "tar", "application/x-gtar": "tar",
+}
+BATCH_TYPES = ("zip", "tar", "batch")
+
+
+def detect_archive_type(filename: str, content_type: str = None):
+    name = (filename or "").lower()
+    for suffix, archive_type in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return archive_type
+    if content_type and detect_file_type(filename) is None:
+        return ARCHIVE_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return None
+
+
+def part_name(index: int, file_type: str, filename: str):
+    # Nombre en disco de cada parte de un upload con varias partes: conserva el
+    # orden, el tipo detectado y el nombre original
+    return f"{index:04d}.{file_type}.{os.path.basename(filename or 'upload')}"
+
+
+def _ignored(name: str):
+    # Directorios, archivos ocultos y metadatos de macOS
+    base = name.rstrip("/").rsplit("/", 1)[-1]
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+def _member(name: str, open_member, file_type: str = None):
+    # (nombre, tipo, contenido o None, error o None). El contenido se lee del
+    # stream del archivo comprimido, sin extraerlo a disco.
+    file_type = file_type or detect_file_type(name)
+    if file_type is None:
+        return name, None, None, "Unsupported file type"
+    with open_member() as member:
+        data = member.read(config.ARCHIVE_MEMBER_MAX_BYTES + 1)
+    if len(data) > config.ARCHIVE_MEMBER_MAX_BYTES:
+        return name, file_type, None, f"File exceeds {config.ARCHIVE_MEMBER_MAX_BYTES} bytes; upload it on its own"
+    return name, file_type, data, None
+
+
+def iter_archive_members(path: str, archive_type: str, prefix: str = ""):
+    try:
+        if archive_type == "zip":
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and not _ignored(info.filename):
+                        yield _member(prefix + info.filename, lambda: archive.open(info))
+        else:
+            # Modo stream: los miembros se leen en orden sin volver atrás en el archivo
+            with tarfile.open(path, mode="r|*") as archive:
+                for info in archive:
+                    if info.isfile() and not _ignored(info.name):
+                        yield _member(prefix + info.name, lambda: archive.extractfile(info))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ValueError(f"Invalid archive: {e}")
+
+
+def iter_upload_members(path: str, job_type: str):
+    # zip/tar: un archivo comprimido. batch: directorio con una parte por archivo
+    # (ver part_name), cada una puede ser a su vez un archivo comprimido.
+    if job_type != "batch":
+        yield from iter_archive_members(path, job_type)
+        return
+    for entry in sorted(os.listdir(path)):
+        _, file_type, name = entry.split(".", 2)
+        part = os.path.join(path, entry)
+        if file_type in BATCH_TYPES:
+            yield from iter_archive_members(part, file_type, prefix=f"{name}/")
+        else:
+            yield _member(name, lambda: open(part, "rb"), file_type)
+
+
+def parse_member(file_type: str, data: bytes, schema=DEFAULT_SCHEMA):
+    # Se ejecuta en un proceso del pool: valida y normaliza un archivo completo.
+    # Las etapas se miden en el proceso del job (iter_parsed_members), no aquí.
+    # Sin deduplicar: records cuenta las filas leídas y el job descarta las
+    # repetidas (del mismo archivo o de anteriores) al cargar.
+    try:
+        with metrics.job_stages(observe=False):
+            batches = [
+                {field: list(values) for field, values in batch.items()}
+                for batch in iter_batches(io.BytesIO(data), file_type, schema=schema, dedup=False)
+            ]
+    except ValueError as e:
+        return {"error": str(e)}
+    return {"batches": batches, "records": sum(len(batch["row_hash"]) for batch in batches)}
+
+
+def iter_parsed_members(members, schema=DEFAULT_SCHEMA):
+    # Valida los archivos en PARSE_WORKERS procesos mientras se sigue leyendo el
+    # archivo comprimido; los resultados salen en el orden original
+    if config.PARSE_WORKERS <= 1:
+        for name, file_type, data, error in members:
+            yield _result((name, file_type, len(data) if data is not None else None, None, error), partial(parse_member, file_type, data, schema))
+        return
+
+    workers = config.PARSE_WORKERS
+    pending = deque()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for name, file_type, data, error in members:
+            future = pool.submit(parse_member, file_type, data, schema) if error is None else None
+            pending.append((name, file_type, len(data) if data is not None else None, future, error))
+            del data
+            # Como máximo dos archivos en vuelo por proceso
+            while len(pending) >= workers * 2:
+                yield _result(pending.popleft())
+        while pending:
+            yield _result(pending.popleft())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _result(entry, parse=None):
+    name, file_type, size, future, error = entry
+    if error is not None:
+        return name, file_type, size, {"error": error}
+    with metrics.stage("validate", size=size) as counts:
+        result = parse() if parse is not None else future.result()
+        counts["rows"] = result.get("records", 0)
+    return name, file_type, size, result
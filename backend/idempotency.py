@@ -0,0 +1,83 @@
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend import config
+from backend.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_enqueue_lock = threading.Lock()
+
+
+class IdempotencyConflict(Exception):
+    pass
+
+
+def _record(hit: bool):
+    with _lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def cache_stats():
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+        "ttl_seconds": config.UPLOAD_CACHE_TTL_SECONDS,
+    }
+
+
+@contextmanager
+def upload_lock(db: Session, company_name: str):
+    # Serializa la búsqueda en la caché y la inserción del job de una compañía:
+    # dos reintentos simultáneos del mismo upload no encolan dos jobs. El llamador
+    # confirma (o revierte) la transacción dentro del bloque. En PostgreSQL es un
+    # advisory lock de la transacción y vale entre instancias de la API; en otros
+    # motores, dentro del proceso.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"upload:{company_name}"})
+        yield
+        return
+    with _enqueue_lock:
+        yield
+
+
+def find_cached_job(db: Session, company_name: str, content_sha256: str, mode: str, idempotency_key: str = None):
+    # Devuelve el job previo equivalente a este upload, o None si hay que procesarlo.
+    # Las entradas expiran a los UPLOAD_CACHE_TTL_SECONDS; 0 desactiva la caché.
+    if config.UPLOAD_CACHE_TTL_SECONDS <= 0:
+        return None
+    since = datetime.utcnow() - timedelta(seconds=config.UPLOAD_CACHE_TTL_SECONDS)
+    jobs = db.query(Job).filter(Job.company_name == company_name, Job.created_at >= since)
+
+    if idempotency_key:
+        job = jobs.filter(Job.idempotency_key == idempotency_key).order_by(Job.id.desc()).first()
+        if job is not None and job.content_sha256 != content_sha256:
+            raise IdempotencyConflict("Idempotency-Key was already used with different content")
+        if job is not None and job.mode != mode:
+            raise IdempotencyConflict(f"Idempotency-Key was already used with mode={job.mode}")
+        # Un job fallido no se repite: el cliente reintenta con la misma clave y se
+        # encola uno nuevo, que es el que encuentran los reintentos siguientes
+        if job is not None and job.state == "failed":
+            job = None
+    else:
+        # Solo el último job vigente de la compañía: si después se cargó otro
+        # contenido, repetir este upload sí cambia los datos
+        job = jobs.filter(Job.state.notin_(["failed", "superseded"])).order_by(Job.id.desc()).first()
+        if job is not None and (job.content_sha256 != content_sha256 or job.mode != mode):
+            job = None
+
+    _record(job is not None)
+    if job is not None:
+        logger.info(f"Upload cache hit for company: {company_name}, job {job.id}")
+    return job
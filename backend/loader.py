@@ -0,0 +1,306 @@
+import io
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import pandas as pd
+from sqlalchemy import delete, exists, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from backend import config, metrics
+from backend.models.company_data import CompanyData
+from backend.models.company_status_summary import CompanyStatusSummary
+from backend.models.company_version import CompanyVersion
+from backend.models.job import Job
+from backend.pipeline import row_hash
+
+logger = logging.getLogger(__name__)
+
+LOAD_COLUMNS = ("company_name", "file_type", "status", "batch_id", "created_at", "field1", "field2", "field3", "extra", "row_hash")
+MERGE_TABLE = "company_data_merge"
+
+
+def iter_chunks(records, size: int):
+    if isinstance(records, pd.DataFrame):
+        for start in range(0, len(records), size):
+            yield records.iloc[start:start + size].to_dict("records")
+        return
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_value(value):
+    # Formato text de COPY: \N para nulos y escape de separadores
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_chunk(cursor, rows, table: str = CompanyData.__tablename__):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(LOAD_COLUMNS)}) FROM STDIN", buffer)
+    return len(rows)
+
+
+def _copy_merge_chunk(cursor, rows):
+    # COPY no admite ON CONFLICT: se copia a una tabla temporal y desde ahí
+    # se insertan solo las filas cuyo contenido aún no existe
+    columns = ", ".join(LOAD_COLUMNS)
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {MERGE_TABLE} ON COMMIT DROP AS "
+        f"SELECT {columns} FROM {CompanyData.__tablename__} WITH NO DATA"
+    )
+    cursor.execute(f"TRUNCATE {MERGE_TABLE}")
+    _copy_chunk(cursor, rows, table=MERGE_TABLE)
+    cursor.execute(
+        f"INSERT INTO {CompanyData.__tablename__} ({columns}) SELECT {columns} FROM {MERGE_TABLE} ON CONFLICT DO NOTHING"
+    )
+    return cursor.rowcount
+
+
+def _insert_statement(dialect, skip_conflicts: bool):
+    table = CompanyData.__table__
+    if not skip_conflicts:
+        statement = insert(table)
+    elif dialect.name == "sqlite":
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    elif dialect.name == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    else:
+        raise ValueError(f"Merge mode is not supported on {dialect.name}")
+    return statement.compile(dialect=dialect, column_keys=list(LOAD_COLUMNS))
+
+
+def _executemany_chunk(connection, compiled, rows):
+    # Se envía directo al driver para evitar el procesamiento de parámetros
+    # por fila del ORM/Core
+    if compiled.positional:
+        order = [LOAD_COLUMNS.index(name) for name in compiled.positiontup]
+        params = [tuple(row[i] for i in order) for row in rows]
+    else:
+        params = [dict(zip(LOAD_COLUMNS, row)) for row in rows]
+    return connection.exec_driver_sql(str(compiled), params).rowcount
+
+
+def bulk_load(records, db: Session, company_name: str, status: str, file_type: str = None, batch_id: int = None,
+              chunk_size: int = None, skip_conflicts: bool = False):
+    # Inserta los registros por bloques: COPY FROM STDIN en PostgreSQL y
+    # executemany en otros dialectos. Con skip_conflicts se omiten las filas
+    # cuyo (company_name, row_hash) ya está publicado. No confirma la transacción.
+    chunk_size = chunk_size or config.LOAD_CHUNK_SIZE
+    db.flush()
+    connection = db.connection()
+    use_copy = connection.dialect.name == "postgresql"
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    if not use_copy:
+        compiled = _insert_statement(connection.dialect, skip_conflicts)
+        process = CompanyData.__table__.c.created_at.type.bind_processor(connection.dialect)
+        created_at = process(created_at) if process else created_at
+    cursor = connection.connection.cursor() if use_copy else None
+
+    start = time.perf_counter()
+    total = 0
+    inserted = 0
+    try:
+        # Leer el bloque (validación y transformación, ver validated_batches) queda
+        # fuera de la etapa load, que mide solo la escritura
+        for chunk in iter_chunks(records, chunk_size):
+            with metrics.stage("load", rows=len(chunk)):
+                rows = [
+                    (
+                        company_name, file_type, status, batch_id, created_at,
+                        row["field1"], int(row["field2"]), row["field3"],
+                        # Campos del esquema de la compañía fuera de las columnas fijas, como texto JSON
+                        json.dumps(row["extra"], ensure_ascii=False) if row.get("extra") else None,
+                        row.get("row_hash") or row_hash(row["field1"], int(row["field2"]), row["field3"], row.get("extra")),
+                    )
+                    for row in chunk
+                ]
+                if use_copy:
+                    inserted += _copy_merge_chunk(cursor, rows) if skip_conflicts else _copy_chunk(cursor, rows)
+                else:
+                    inserted += _executemany_chunk(connection, compiled, rows)
+            total += len(rows)
+    finally:
+        if cursor is not None:
+            cursor.close()
+
+    adjust_status_summary(db, company_name, {status: inserted})
+    elapsed = time.perf_counter() - start
+    rows_per_sec = total / elapsed if elapsed > 0 else float(total)
+    logger.info(f"Loaded {inserted} of {total} rows for {company_name} in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+    return {"rows": total, "inserted": inserted, "skipped": total - inserted, "seconds": elapsed, "rows_per_sec": rows_per_sec}
+
+
+def lock_company(db: Session, company_name: str):
+    # Serializa las promociones de una misma compañía hasta el fin de la transacción.
+    # SQLite ya serializa las escrituras.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:company_name))"), {"company_name": company_name})
+
+
+def _increment(db: Session, model, keys: dict, column: str, amount: int):
+    # UPSERT que suma amount a la columna, creando la fila si no existe
+    now = datetime.utcnow()
+    dialect = db.get_bind().dialect.name
+    counter = getattr(model, column)
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        db.execute(
+            module.insert(model)
+            .values(**keys, **{column: amount}, updated_at=now)
+            .on_conflict_do_update(index_elements=list(keys), set_={column: counter + amount, "updated_at": now})
+        )
+        return
+    result = db.execute(
+        update(model)
+        .where(*[getattr(model, key) == value for key, value in keys.items()])
+        .values(**{column: counter + amount}, updated_at=now)
+    )
+    if not result.rowcount:
+        db.execute(insert(model).values(**keys, **{column: amount}, updated_at=now))
+
+
+def bump_company_version(db: Session, company_name: str):
+    # Se ejecuta dentro de la transacción que cambia los datos: la nueva versión
+    # es visible exactamente cuando lo son los datos
+    _increment(db, CompanyVersion, {"company_name": company_name}, "version", 1)
+
+
+def adjust_status_summary(db: Session, company_name: str, deltas: dict):
+    # Aplica {status: +/-filas} al resumen en la misma transacción que mueve las filas
+    for status, delta in deltas.items():
+        if delta:
+            _increment(db, CompanyStatusSummary, {"company_name": company_name, "status": status}, "row_count", delta)
+
+
+def rebuild_status_summary(db: Session, company_name: str = None):
+    # Recalcula el resumen desde company_data (datos anteriores al resumen o reparación)
+    summary = delete(CompanyStatusSummary)
+    counts = select(CompanyData.company_name, CompanyData.status, func.count()).group_by(CompanyData.company_name, CompanyData.status)
+    if company_name is not None:
+        summary = summary.where(CompanyStatusSummary.company_name == company_name)
+        counts = counts.where(CompanyData.company_name == company_name)
+    db.execute(summary)
+    now = datetime.utcnow()
+    rows = [
+        {"company_name": company, "status": status, "row_count": count, "updated_at": now}
+        for company, status, count in db.execute(counts)
+    ]
+    if rows:
+        db.execute(insert(CompanyStatusSummary), rows)
+    return len(rows)
+
+
+def ensure_status_summary(db: Session):
+    # Primer arranque con datos previos al resumen: se construye una sola vez
+    if db.scalar(select(exists().select_from(CompanyStatusSummary))):
+        return
+    if db.scalar(select(exists().select_from(CompanyData))):
+        logger.info(f"Built status summary: {rebuild_status_summary(db)} rows")
+    db.commit()
+
+
+def _delete_rows(db: Session, company_name: str, *where):
+    # Borra filas de la compañía y descuenta del resumen cuántas había de cada estado
+    statement = delete(CompanyData).where(*where)
+    with metrics.stage("delete") as stage_counts:
+        if db.get_bind().dialect.name == "postgresql":
+            # Conteo exacto de lo que borró esta sentencia aunque otra transacción confirme en paralelo
+            deleted = statement.returning(CompanyData.status).cte("deleted")
+            counts = db.execute(select(deleted.c.status, func.count()).group_by(deleted.c.status)).all()
+        else:
+            # SQLite: la transacción ya tiene el bloqueo de escritura, nadie más escribe entre ambas sentencias
+            counts = db.execute(select(CompanyData.status, func.count()).where(*where).group_by(CompanyData.status)).all()
+            db.execute(statement)
+        adjust_status_summary(db, company_name, {status: -count for status, count in counts})
+        stage_counts["rows"] = sum(count for _, count in counts)
+    return stage_counts["rows"]
+
+
+def set_batch_status(db: Session, company_name: str, batch_id: int, from_status: str, to_status: str):
+    result = db.execute(
+        update(CompanyData)
+        .where(CompanyData.batch_id == batch_id, CompanyData.status == from_status)
+        .values(status=to_status)
+    )
+    adjust_status_summary(db, company_name, {from_status: -result.rowcount, to_status: result.rowcount})
+    return result.rowcount
+
+
+def promote_batch(db: Session, company_name: str, batch_id: int):
+    # Publica un lote "staged" en una sola transacción corta: reemplaza los datos
+    # de lotes anteriores y descarta el lote si ya se publicó un reemplazo más reciente.
+    lock_company(db, company_name)
+    bump_company_version(db, company_name)
+    newer = db.execute(
+        select(exists().where(
+            CompanyData.company_name == company_name,
+            CompanyData.status == "processed",
+            CompanyData.batch_id > batch_id,
+            CompanyData.batch_id.in_(select(Job.id).where(Job.company_name == company_name, Job.mode == "replace")),
+        ))
+    ).scalar()
+    if newer:
+        _delete_rows(db, company_name, CompanyData.batch_id == batch_id)
+        db.commit()
+        logger.info(f"Batch {batch_id} for {company_name} superseded by a newer batch")
+        return False
+
+    _delete_rows(
+        db, company_name,
+        CompanyData.company_name == company_name,
+        CompanyData.status.in_(["processed", "failed"]),
+        (CompanyData.batch_id < batch_id) | CompanyData.batch_id.is_(None),
+    )
+    clear_batch_marker(db, company_name, batch_id)
+    # Filas que un merge más reciente ya publicó: se conserva la existente
+    published = select(CompanyData.row_hash).where(
+        CompanyData.company_name == company_name, CompanyData.status == "processed"
+    )
+    _delete_rows(
+        db, company_name, CompanyData.batch_id == batch_id, CompanyData.status == "staged", CompanyData.row_hash.in_(published)
+    )
+    # Copias de una fila en el propio lote: un intento anterior del job que perdió
+    # el lease y siguió cargando. Se conserva la primera.
+    first = (
+        select(func.min(CompanyData.id))
+        .where(CompanyData.batch_id == batch_id, CompanyData.status == "staged")
+        .group_by(CompanyData.row_hash)
+    )
+    _delete_rows(db, company_name, CompanyData.batch_id == batch_id, CompanyData.status == "staged", CompanyData.id.not_in(first))
+    promoted = set_batch_status(db, company_name, batch_id, "staged", "processed")
+    db.commit()
+    logger.info(f"Batch {batch_id} promoted for {company_name}: {promoted} rows")
+    return True
+
+
+def reset_batch(db: Session, company_name: str, batch_id: int):
+    # Un job reintentado (lease vencido) reutiliza su batch_id: descarta el marcador,
+    # las filas staged y las failed que dejó el intento anterior. Las publicadas se conservan.
+    return _delete_rows(
+        db, company_name, CompanyData.batch_id == batch_id, CompanyData.status.in_(["uploaded", "processing", "staged", "failed"])
+    )
+
+
+def clear_batch_marker(db: Session, company_name: str, batch_id: int):
+    _delete_rows(db, company_name, CompanyData.batch_id == batch_id, CompanyData.status.in_(["uploaded", "processing"]))
+
+
+def fail_batch(db: Session, company_name: str, batch_id: int):
+    # Solo afecta al lote fallido: los datos publicados antes quedan intactos
+    _delete_rows(db, company_name, CompanyData.batch_id == batch_id, CompanyData.status == "staged")
+    for status in ("uploaded", "processing", "processed"):
+        set_batch_status(db, company_name, batch_id, status, "failed")
+    db.commit()
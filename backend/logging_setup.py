@@ -0,0 +1,49 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from backend import config
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener = None
+_pid = None
+
+
+def configure_logging(path: str = None, level: str = None):
+    # Los logs se encolan y un hilo los escribe en el archivo y la consola: el
+    # request o el job no esperan la escritura a disco. Se vuelve a configurar en
+    # un proceso hijo (fork), que no hereda el hilo del padre.
+    global _listener, _pid
+    if _listener is not None and _pid == os.getpid():
+        return _listener
+    path = path or config.LOG_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.FileHandler(path), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _pid = os.getpid()
+    root = logging.getLogger()
+    root.setLevel(level or config.LOG_LEVEL)
+    root.handlers = [QueueHandler(records)]
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    # Escribe lo que quede en la cola y detiene el hilo (se ejecuta al terminar el proceso)
+    global _listener
+    if _listener is not None and _pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+
+atexit.register(stop_logging)
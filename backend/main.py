@@ -1,27 +1,28 @@
 import logging
-from fastapi import FastAPI, HTTPException, Request
-from backend.database import engine, Base
-from backend.models import company_data
-from backend.routers import upload
-from pydantic import BaseModel, ValidationError
-from lxml import etree
+from fastapi import FastAPI
+from backend.database import engine, Base, SessionLocal
+from backend.loader import ensure_status_summary
+from backend.logging_setup import configure_logging
+from backend.migrations import upgrade_schema
+from backend.models import company_data, company_schema, company_status_summary, company_version, job, job_file, upload_reservation
+from backend.routers import export, jobs, metrics, schemas, upload, validate
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("logs/app.log"),  # Archivo de log
-        logging.StreamHandler()  # Consola
-    ]
-)
+# Configurar logging (archivo en LOG_FILE y consola, escritos desde un hilo aparte)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Crear las tablas en la base de datos
+# Crear las tablas en la base de datos y agregar a las existentes las columnas e índices nuevos
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+with SessionLocal() as db:
+    ensure_status_summary(db)
 
 # Inicializar la aplicación FastAPI
 app = FastAPI()
+# Presupuesto de admisión de /process, antes de recibir el cuerpo del upload
+app.add_middleware(upload.AdmissionMiddleware)
+# Latencia de cada request por ruta, expuesta en /metrics (incluye los 429 de admisión)
+app.add_middleware(metrics.LatencyMiddleware)
 
 # Ruta principal
 @app.get("/")
@@ -29,52 +30,10 @@ def home():
     logger.info("Home endpoint accessed")
     return {"message": "Data Integration Platform running"}
 
-# Incluir el router existente
+# Incluir los routers
 app.include_router(upload.router)
-
-# Modelo Pydantic para validar JSON
-class DataModel(BaseModel):
-    field1: str
-    field2: int
-    field3: str
-
-# Ruta para validar JSON o XML
-@app.post("/validate")
-async def validate_data(request: Request):
-    logger.info("Validate endpoint called")
-    content_type = request.headers.get("content-type")
-    
-    # Validar JSON
-    if content_type and "application/json" in content_type:
-        try:
-            body = await request.json()
-            if not body:
-                logger.error("JSON body is empty")
-                raise HTTPException(status_code=400, detail="JSON body is empty")
-            # Validar estructura JSON
-            DataModel(**body)
-            logger.info("JSON validation successful")
-        except ValidationError as e:
-            logger.error(f"JSON validation error: {e}")
-            raise HTTPException(status_code=400, detail=f"Invalid JSON structure: {e}")
-        return {"message": "Valid JSON"}
-    
-    # Validar XML
-    elif content_type and ("application/xml" in content_type or "text/xml" in content_type):
-        try:
-            body = await request.body()
-            if not body.strip():
-                logger.error("XML body is empty")
-                raise HTTPException(status_code=400, detail="XML body is empty")
-            # Validar estructura XML
-            etree.fromstring(body)
-            logger.info("XML validation successful")
-        except etree.XMLSyntaxError as e:
-            logger.error(f"XML validation error: {e}")
-            raise HTTPException(status_code=400, detail=f"Invalid XML: {e}")
-        return {"message": "Valid XML"}
-    
-    # Tipo de contenido no soportado o faltante
-    else:
-        logger.warning(f"Unsupported content-type: {content_type}")
-        raise HTTPException(status_code=415, detail="Unsupported or missing Content-Type. Use application/json or application/xml.")
\ No newline at end of file
+app.include_router(jobs.router)
+app.include_router(export.router)
+app.include_router(schemas.router)
+app.include_router(validate.router)
+app.include_router(metrics.router)
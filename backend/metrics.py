@@ -0,0 +1,120 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Etapas de la ingesta: receive (upload a disco), validate (parseo y validación),
+# transform (hash y deduplicación), delete (reemplazo de datos anteriores) y load (inserción)
+STAGES = ("receive", "validate", "transform", "delete", "load")
+
+STAGE_SECONDS = Histogram(
+    "ingest_stage_duration_seconds", "Time spent in each ingestion stage per job", ["stage"],
+    buckets=(0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+STAGE_ROWS = Histogram(
+    "ingest_stage_rows", "Rows handled by each ingestion stage per job", ["stage"],
+    buckets=(1, 10, 100, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8),
+)
+STAGE_BYTES = Histogram(
+    "ingest_stage_bytes", "Bytes handled by each ingestion stage per job", ["stage"],
+    buckets=(2**10, 2**14, 2**17, 2**20, 2**23, 2**26, 2**29, 2**32, 2**35),
+)
+STAGE_FAILURES = Counter("ingest_stage_failures_total", "Failures by the ingestion stage that raised the error", ["stage"])
+JOBS_FINISHED = Counter("ingest_jobs_finished_total", "Finished ingestion jobs by final state", ["state"])
+PARALLEL_FALLBACKS = Counter(
+    "ingest_parallel_fallbacks_total", "Parallel parses that continued sequentially because a range did not split on a record boundary",
+    ["file_type"],
+)
+ADMISSIONS_REJECTED = Counter("ingest_admission_rejected_total", "Uploads rejected with 429 by the exceeded budget", ["limit"])
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the last byte of the response", ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Totales por etapa del job en curso: se observan una vez al terminar el job
+_job_totals = ContextVar("ingest_job_totals", default=None)
+
+
+def _observe(stage: str, seconds: float, rows: int, size: int):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if rows:
+        STAGE_ROWS.labels(stage).observe(rows)
+    if size:
+        STAGE_BYTES.labels(stage).observe(size)
+
+
+def add(stage: str, seconds: float = 0.0, rows: int = 0, size: int = 0):
+    totals = _job_totals.get()
+    if totals is None:
+        _observe(stage, seconds, rows, size)
+        return
+    entry = totals.setdefault(stage, [0.0, 0, 0])
+    entry[0] += seconds
+    entry[1] += rows
+    entry[2] += size
+
+
+@contextmanager
+def stage(name: str, rows: int = 0, size: int = 0):
+    # Mide un bloque de una etapa. Se pueden completar rows/size al terminar:
+    #   with metrics.stage("delete") as counts: counts["rows"] = borradas
+    counts = {"rows": rows, "size": size}
+    start = time.perf_counter()
+    try:
+        yield counts
+    except Exception as e:
+        # El error se atribuye a la etapa más interna donde ocurrió
+        if _job_totals.get() is None:
+            STAGE_FAILURES.labels(name).inc()
+        elif not hasattr(e, "ingest_stage"):
+            e.ingest_stage = name
+        raise
+    finally:
+        add(name, time.perf_counter() - start, counts["rows"], counts["size"])
+
+
+@contextmanager
+def job_stages(observe: bool = True):
+    # Acumula las etapas de un job. Con observe=False se descartan (procesos de
+    # parseo: el proceso que espera el resultado ya mide la etapa).
+    token = _job_totals.set({})
+    try:
+        yield
+    except Exception as e:
+        if observe:
+            STAGE_FAILURES.labels(getattr(e, "ingest_stage", "other")).inc()
+        raise
+    finally:
+        totals = _job_totals.get()
+        _job_totals.reset(token)
+        if observe:
+            for name, (seconds, rows, size) in totals.items():
+                _observe(name, seconds, rows, size)
+
+
+class _Values:
+    def __init__(self, families):
+        self._families = families
+
+    def collect(self):
+        return self._families
+
+
+def render(gauges: dict = None):
+    # Formato de texto de Prometheus. Con PROMETHEUS_MULTIPROC_DIR (API y worker
+    # comparten el directorio) se suman los valores de todos los procesos.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(registry)
+    if gauges:
+        # Valores leídos al momento del scrape (p. ej. de la tabla jobs)
+        current = CollectorRegistry(auto_describe=False)
+        current.register(_Values([GaugeMetricFamily(name, doc, value=value) for name, (doc, value) in gauges.items()]))
+        output += generate_latest(current)
+    return output
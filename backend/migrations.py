@@ -0,0 +1,47 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from backend.database import Base
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(connection, table, column):
+    dialect = connection.dialect
+    if not column.nullable and column.server_default is None:
+        # Una columna obligatoria sin valor por defecto no se puede agregar a una tabla con filas
+        raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a server default")
+    preparer = dialect.identifier_preparer
+    ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    connection.execute(text(ddl))
+
+
+def upgrade_schema(engine, metadata=Base.metadata):
+    # create_all solo crea las tablas que faltan: en una base existente agrega las
+    # columnas y los índices nuevos de los modelos (batch_id, row_hash, extra, ...).
+    # Es idempotente y se ejecuta en cada arranque después de create_all.
+    added = []
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Varias instancias arrancando a la vez: una sola aplica los cambios
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_upgrade'))"))
+        inspector = inspect(connection)
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    _add_column(connection, table, column)
+                    added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    added.append(index.name)
+    if added:
+        logger.info(f"Schema upgraded: added {', '.join(added)}")
+    return added
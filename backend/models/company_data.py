@@ -1,16 +1,33 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, JSON, text
+from sqlalchemy.dialects.postgresql import JSONB
 from backend.database import Base
 from datetime import datetime
 
 class CompanyData(Base):
     __tablename__ = "company_data"
+    __table_args__ = (
+        # Paginación por keyset de /status: WHERE company_name = ? AND id > ? ORDER BY id
+        Index("ix_company_data_company_id", "company_name", "id"),
+        # Filtros por estado de /status y conteos por estado al mover lotes
+        Index("ix_company_data_company_status", "company_name", "status"),
+        # Una fila publicada por contenido y compañía; base del modo merge (ON CONFLICT DO NOTHING)
+        Index(
+            "uq_company_data_row_hash", "company_name", "row_hash", unique=True,
+            postgresql_where=text("status = 'processed'"), sqlite_where=text("status = 'processed'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     company_name = Column(String, index=True)
     file_type = Column(String)
     status = Column(String)
+    # Job que cargó la fila; las filas "staged" no son visibles hasta que el lote se promueve
+    batch_id = Column(Integer, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     field1 = Column(String, nullable=False)
     field2 = Column(Integer, nullable=False)
-    field3 = Column(String, nullable=False)
\ No newline at end of file
+    field3 = Column(String, nullable=False)
+    # Campos del esquema de la compañía que no van en field1..field3 (ver backend/schemas.py)
+    extra = Column(JSON().with_variant(JSONB(), "postgresql"))
+    row_hash = Column(String(32))
\ No newline at end of file
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from backend.database import Base
+from datetime import datetime
+
+class CompanySchema(Base):
+    __tablename__ = "company_schemas"
+    __table_args__ = (UniqueConstraint("company_name", "version", name="uq_company_schemas_version"),)
+
+    id = Column(Integer, primary_key=True)
+    company_name = Column(String, nullable=False, index=True)
+    # Versiones consecutivas desde 1; los uploads usan la más reciente
+    version = Column(Integer, nullable=False)
+    # Definición validada por backend.schemas.SchemaSpec
+    definition = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "company_name": self.company_name,
+            "version": self.version,
+            **self.definition,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
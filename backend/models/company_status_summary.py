@@ -0,0 +1,13 @@
+from sqlalchemy import Column, BigInteger, String, DateTime
+from backend.database import Base
+from datetime import datetime
+
+class CompanyStatusSummary(Base):
+    __tablename__ = "company_status_summary"
+
+    # Filas de company_data por compañía y estado, mantenidas por el ETL en la
+    # misma transacción que mueve las filas
+    company_name = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from backend.database import Base
+from datetime import datetime
+
+class CompanyVersion(Base):
+    __tablename__ = "company_versions"
+
+    company_name = Column(String, primary_key=True)
+    # Se incrementa en cada transacción que cambia los datos visibles de la compañía;
+    # es la base del ETag de /status y de las claves de su caché
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text
+from backend.database import Base
+from datetime import datetime
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_name = Column(String, index=True, nullable=False)
+    file_type = Column(String)
+    file_path = Column(String)
+    # replace: reemplaza los datos de la compañía; merge: solo agrega filas nuevas
+    mode = Column(String, nullable=False, default="replace")
+    # queued -> running -> completed | failed | superseded (un lote más reciente ya se publicó)
+    state = Column(String, index=True, nullable=False, default="queued")
+    worker = Column(String)
+    # Caché idempotente: SHA-256 del archivo y cabecera Idempotency-Key del cliente
+    content_sha256 = Column(String(64), index=True)
+    idempotency_key = Column(String, index=True)
+    error = Column(Text)
+
+    bytes_received = Column(BigInteger, default=0)
+    records_loaded = Column(Integer)
+    records_skipped = Column(Integer)
+    # Versión del esquema de la compañía con la que se validó (0: esquema por defecto)
+    schema_version = Column(Integer)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # Lease del worker: se renueva mientras procesa; vencido, el job vuelve a la cola
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "company_name": self.company_name,
+            "file_type": self.file_type,
+            "mode": self.mode,
+            "state": self.state,
+            "error": self.error,
+            "bytes_received": self.bytes_received,
+            "records_loaded": self.records_loaded,
+            "records_skipped": self.records_skipped,
+            "schema_version": self.schema_version,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "heartbeat_at": self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
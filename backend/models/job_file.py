@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey
+from backend.database import Base
+
+class JobFile(Base):
+    __tablename__ = "job_files"
+
+    # Resultado por archivo de un job con varias partes o un archivo comprimido
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), index=True, nullable=False)
+    # Nombre de la parte o ruta del miembro dentro del archivo comprimido
+    name = Column(String, nullable=False)
+    file_type = Column(String)
+    # completed | failed
+    state = Column(String, nullable=False)
+    size_bytes = Column(BigInteger)
+    records_read = Column(Integer, default=0)
+    records_loaded = Column(Integer, default=0)
+    records_skipped = Column(Integer, default=0)
+    error = Column(Text)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "file_type": self.file_type,
+            "state": self.state,
+            "size_bytes": self.size_bytes,
+            "records_read": self.records_read,
+            "records_loaded": self.records_loaded,
+            "records_skipped": self.records_skipped,
+            "error": self.error,
+        }
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from backend.database import Base
+from datetime import datetime
+
+class UploadReservation(Base):
+    __tablename__ = "upload_reservations"
+
+    # Presupuesto de admisión de un upload que todavía se está recibiendo:
+    # cuenta como un job en vuelo hasta que se encola o termina el request
+    id = Column(Integer, primary_key=True, index=True)
+    company_name = Column(String, index=True, nullable=False)
+    # Content-Length del request (0 si no se conoce)
+    bytes_reserved = Column(BigInteger, nullable=False, default=0)
+    # Una reserva que no se liberó (proceso caído) deja de contar a los ADMISSION_RESERVATION_SECONDS
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,258 @@
+import json
+import logging
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+from backend import config, metrics
+from backend.pipeline import (
+    READERS, batch_hashes, dedup_batch, error_message, read_batches, validate_batch, validated_batches,
+)
+from backend.schemas import DEFAULT_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+HEAD_BYTES = 64 * 1024
+JSON_LIST_START = re.compile(rb"\s*\[")
+JSON_LIST_END = re.compile(rb"\]\s*\Z")
+JSON_RECORDS_START = re.compile(rb'\s*\{\s*"records"\s*:\s*\[')
+JSON_RECORDS_END = re.compile(rb"\]\s*\}\s*\Z")
+JSON_RECORD_SPLIT = re.compile(rb"\}\s*,\s*\{")
+XML_RECORDS_START = re.compile(
+    rb"\s*(?:<\?.*?\?>\s*|<!--.*?-->\s*)*<([A-Za-z_][\w.\-]*)(?:\s[^>]*)?(?<!/)>\s*(?:<!--.*?-->\s*)*<([A-Za-z_][\w.\-]*)",
+    re.S,
+)
+
+
+class RangeReader:
+    # Archivo de solo lectura sobre [start, end) de otro archivo, con bytes
+    # opcionales antes y después (p. ej. corchetes o una raíz XML sintética)
+
+    def __init__(self, path: str, start: int, end: int, prefix: bytes = b"", suffix: bytes = b""):
+        self._file = open(path, "rb")
+        self._start, self._end = start, end
+        self._prefix, self._suffix = prefix, suffix
+        self.seek(0)
+
+    def seek(self, position: int, whence: int = 0):
+        if position != 0 or whence != 0:
+            raise OSError("RangeReader only supports seek(0)")
+        self._file.seek(self._start)
+        self._parts = deque([self._prefix, None, self._suffix])
+        return 0
+
+    def read(self, size: int = -1):
+        while self._parts:
+            part = self._parts[0]
+            if part is None:
+                remaining = self._end - self._file.tell()
+                chunk = self._file.read(remaining if size < 0 else min(size, remaining))
+                if chunk:
+                    return chunk
+            elif part:
+                chunk = part if size < 0 else part[:size]
+                self._parts[0] = part[len(chunk):]
+                return chunk
+            self._parts.popleft()
+        return b""
+
+    def close(self):
+        self._file.close()
+
+
+def _json_region(data):
+    head = data[:HEAD_BYTES]
+    tail = data[-HEAD_BYTES:]
+    for start_pattern, end_pattern in ((JSON_LIST_START, JSON_LIST_END), (JSON_RECORDS_START, JSON_RECORDS_END)):
+        start, end = start_pattern.match(head), end_pattern.search(tail)
+        if start and end:
+            region_end = len(data) - len(tail) + end.start()
+            return start.end(), region_end, _json_split, {}
+    return None
+
+
+def _json_split(data, target, end, _):
+    match = JSON_RECORD_SPLIT.search(data, target, end)
+    if match is None:
+        return None
+    # El bloque termina en "}" y el siguiente empieza en "{"
+    return match.start() + 1, match.end() - 1
+
+
+def _ndjson_region(data):
+    return 0, len(data), _ndjson_split, {}
+
+
+def _ndjson_split(data, target, end, _):
+    position = data.find(b"\n", target, end)
+    if position < 0:
+        return None
+    return position + 1, position + 1
+
+
+def _xml_region(data):
+    match = XML_RECORDS_START.match(data[:HEAD_BYTES])
+    if match is None:
+        return None
+    root_tag, record_tag = match.group(1), match.group(2)
+    region_end = data.rfind(b"</" + root_tag)
+    if region_end < match.start(2):
+        return None
+    return match.start(2) - 1, region_end, _xml_split, {"close": b"</" + record_tag + b">"}
+
+
+def _xml_split(data, target, end, options):
+    position = data.find(options["close"], target, end)
+    if position < 0:
+        return None
+    position += len(options["close"])
+    return position, position
+
+
+# Formatos de texto que se pueden cortar en límites de registro
+REGIONS = {"json": _json_region, "ndjson": _ndjson_region, "xml": _xml_region}
+
+
+def plan_ranges(file_obj, file_type: str):
+    # Divide un archivo grande en rangos de bytes alineados a registros.
+    # Devuelve None cuando conviene el camino secuencial.
+    if config.PARSE_WORKERS <= 1 or file_type not in REGIONS:
+        return None
+    path = getattr(file_obj, "name", None)
+    if not isinstance(path, str) or not os.path.isfile(path) or os.path.getsize(path) < config.PARALLEL_MIN_BYTES:
+        return None
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        region = REGIONS[file_type](data)
+        if region is None:
+            return None
+        start, end, split, options = region
+        ranges = []
+        position = start
+        while position < end:
+            boundary = None
+            if position + config.PARALLEL_CHUNK_BYTES < end:
+                boundary = split(data, position + config.PARALLEL_CHUNK_BYTES, end, options)
+            if boundary is None:
+                ranges.append((position, end))
+                break
+            ranges.append((position, boundary[0]))
+            position = boundary[1]
+    if not ranges:
+        return None
+    return {"path": path, "ranges": ranges, "end": end}
+
+
+def _wrap(file_type: str):
+    return {"json": (b"[", b"]"), "xml": (b"<chunk>", b"</chunk>")}.get(file_type, (b"", b""))
+
+
+def _parse_ndjson_lines(data):
+    # Mismas reglas que read_ndjson_records; los errores se informan con el número
+    # de línea relativo al rango y iter_parallel_batches lo lleva a absoluto
+    lines = data.split(b"\n")
+    if lines[-1] == b"":
+        lines.pop()
+    items = []
+    for number, line in enumerate(lines, 1):
+        if len(line) + 1 > config.JSON_MAX_RECORD_BYTES:
+            return (number, f"record exceeds {config.JSON_MAX_RECORD_BYTES} bytes"), len(lines)
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            return (number, str(e)), len(lines)
+    return items, len(lines)
+
+
+def parse_range(path: str, file_type: str, start: int, end: int, schema=DEFAULT_SCHEMA):
+    # Se ejecuta en un proceso del pool: parsea, valida y normaliza un rango
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    prefix, suffix = _wrap(file_type)
+    try:
+        if file_type == "json":
+            items = json.loads(prefix + data + suffix)
+        elif file_type == "ndjson":
+            items, lines = _parse_ndjson_lines(data)
+            if isinstance(items, tuple):
+                return {"line_error": items}
+        else:
+            parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+            root = etree.fromstring(prefix + data + suffix, parser)
+            items = [
+                {child.tag: child.text for child in record if isinstance(child.tag, str)}
+                for record in root if isinstance(record.tag, str)
+            ]
+    except (ValueError, etree.XMLSyntaxError) as e:
+        # Un corte que no cae entre registros (o un error real de sintaxis)
+        return {"parse_error": str(e)}
+    del data
+
+    columns, errors = validate_batch(items, file_type, schema=schema)
+    if errors:
+        index, reason = errors[0]
+        return {"error": error_message(items[index], reason, file_type, schema)}
+    result = {"columns": {field: list(values) for field, values in columns.items()}, "hashes": batch_hashes(columns)}
+    if file_type == "ndjson":
+        result["lines"] = lines
+    return result
+
+
+def iter_parallel_batches(plan, file_type: str, batch_size: int, seen, schema=DEFAULT_SCHEMA):
+    # Reparte los rangos entre PARSE_WORKERS procesos y produce los resultados
+    # en el orden del archivo, con la misma deduplicación que el camino secuencial
+    workers = config.PARSE_WORKERS
+    ranges = deque(plan["ranges"])
+    pending = deque()
+    lines = 0
+    parsed = 0
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while ranges or pending:
+            # Como máximo dos rangos en vuelo por proceso: la memoria no depende del tamaño del archivo
+            while ranges and len(pending) < workers * 2:
+                start, end = ranges.popleft()
+                pending.append((start, pool.submit(parse_range, plan["path"], file_type, start, end, schema)))
+            start, future = pending.popleft()
+            # El parseo y la validación ocurren en el pool: se mide la espera del resultado
+            with metrics.stage("validate") as counts:
+                result = future.result()
+                counts["rows"] = len(result.get("hashes", ()))
+            if "parse_error" in result:
+                # Desde este rango se continúa de forma secuencial, que da el
+                # resultado correcto aunque el corte haya caído dentro de un registro
+                # (p. ej. "}, {" en un objeto anidado o en un texto). Se pierde el
+                # paralelismo del resto del archivo: se informa en log y métrica.
+                metrics.PARALLEL_FALLBACKS.labels(file_type).inc()
+                logger.warning(
+                    f"Parallel parse of {plan['path']} continues sequentially from byte {start} of {plan['end']}: {result['parse_error']}"
+                )
+                prefix, suffix = _wrap(file_type)
+                reader = RangeReader(plan["path"], start, plan["end"], prefix, suffix)
+                try:
+                    yield from validated_batches(read_batches(reader, file_type, batch_size, schema), file_type, seen, schema)
+                finally:
+                    reader.close()
+                return
+            if "line_error" in result:
+                number, message = result["line_error"]
+                raise ValueError(f"line {lines + number}: {message}")
+            if "error" in result:
+                raise ValueError(result["error"])
+            lines += result.get("lines", 0)
+            parsed += len(result["hashes"])
+            with metrics.stage("transform") as counts:
+                batch = dedup_batch(result["columns"], result["hashes"], seen)
+                counts["rows"] = len(batch["row_hash"])
+            yield batch
+        if not parsed:
+            raise ValueError(f"{READERS[file_type].label} body is empty")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,698 @@
+import codecs
+import csv
+import hashlib
+import json
+from itertools import islice
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+from pydantic import ValidationError
+
+from backend import config, metrics
+from backend.schemas import DEFAULT_SCHEMA, DataModel, compile_schema
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pq = None
+
+REQUIRED_FIELDS = ("field1", "field2", "field3")
+
+
+class JsonRecordReader:
+    # Lector incremental de JSON: recibe bloques con feed() y devuelve los
+    # registros completos. Soporta {"records": [...]}, lista directa u objeto único.
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._offset = 0
+        self._state = "start"
+        self._stack = []
+        self._top = {}
+        self._key = None
+        self._count = 0
+        self._closed = False
+
+    def feed(self, chunk: bytes):
+        self._compact(self._text.decode(chunk))
+        records = self._advance()
+        if len(self._buffer) - self._pos > config.JSON_MAX_RECORD_BYTES:
+            raise ValueError("JSON record too large or malformed")
+        return records
+
+    def close(self):
+        self._compact(self._text.decode(b"", final=True))
+        self._closed = True
+        records = self._advance()
+        if self._state != "end":
+            if self._state == "start":
+                raise ValueError("Expecting value: char 0")
+            raise self._error("Unexpected end of JSON input")
+        return records
+
+    def _compact(self, text: str):
+        # Descarta lo ya consumido; _offset conserva la posición absoluta
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+
+    def _error(self, message: str, pos: int = None):
+        pos = self._pos if pos is None else pos
+        return ValueError(f"{message}: char {self._offset + pos}")
+
+    def _peek(self):
+        # Siguiente carácter significativo, o None si hace falta más entrada
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in " \t\n\r":
+            pos += 1
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else None
+
+    def _decode_value(self):
+        # Decodifica un valor completo; None si el bloque aún no lo contiene
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as e:
+            # Un error lejos del final del buffer no se arregla con más entrada
+            incomplete = e.pos >= len(self._buffer) - 16 or e.msg.startswith("Unterminated string")
+            if self._closed or not incomplete:
+                raise self._error(e.msg, e.pos)
+            return None
+        if not self._closed:
+            # Un número al final del bloque puede continuar en el siguiente
+            if end >= len(self._buffer):
+                return None
+            if isinstance(value, (int, float)) and self._buffer[end] in "0123456789.eE+-":
+                return None
+        self._pos = end
+        return (value,)
+
+    def _advance(self):
+        records = []
+        while True:
+            char = self._peek()
+            if char is None:
+                return records
+            state = self._state
+            if state == "start":
+                if char == "[":
+                    self._state, self._stack = "array_first", ["list"]
+                elif char == "{":
+                    self._state = "object_first"
+                else:
+                    raise ValueError("Unsupported JSON structure")
+                self._pos += 1
+            elif state in ("array_first", "array_next") and char == "]":
+                self._pos += 1
+                if self._stack.pop() == "list":
+                    if not self._count:
+                        raise ValueError("JSON body is empty")
+                    self._state = "end"
+                else:
+                    self._state = "object_next"
+            elif state == "array_next":
+                if char != ",":
+                    raise self._error("Expecting ',' delimiter")
+                self._pos += 1
+                self._state = "array_value"
+            elif state in ("array_first", "array_value"):
+                decoded = self._decode_value()
+                if decoded is None:
+                    return records
+                records.append(decoded[0])
+                self._count += 1
+                self._state = "array_next"
+            elif state in ("object_first", "object_next") and char == "}":
+                self._pos += 1
+                self._state = "end"
+                if "records" not in self._top:
+                    if not self._top:
+                        raise ValueError("JSON body is empty")
+                    records.append(self._top)
+            elif state == "object_next":
+                if char != ",":
+                    raise self._error("Expecting ',' delimiter")
+                self._pos += 1
+                self._state = "object_key"
+            elif state in ("object_first", "object_key"):
+                start = self._pos
+                decoded = self._decode_value()
+                if decoded is None:
+                    return records
+                if not isinstance(decoded[0], str):
+                    raise self._error("Expecting property name", start)
+                self._key = decoded[0]
+                self._state = "object_colon"
+            elif state == "object_colon":
+                if char != ":":
+                    raise self._error("Expecting ':' delimiter")
+                self._pos += 1
+                self._state = "object_value"
+            elif state == "object_value":
+                if self._key == "records" and char == "[":
+                    self._pos += 1
+                    self._top["records"] = None
+                    self._stack.append("records")
+                    self._state = "array_first"
+                    continue
+                if self._key == "records":
+                    raise ValueError("Unsupported JSON structure")
+                decoded = self._decode_value()
+                if decoded is None:
+                    return records
+                self._top[self._key] = decoded[0]
+                self._state = "object_next"
+            else:
+                raise self._error("Extra data")
+
+
+def _read_records(file_obj, reader):
+    # Alimenta un lector incremental (feed/close) con bloques del archivo
+    while True:
+        chunk = file_obj.read(config.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield from reader.feed(chunk)
+    yield from reader.close()
+
+
+def read_json_records(file_obj):
+    return _read_records(file_obj, JsonRecordReader())
+
+
+class XmlRecordReader:
+    # Lector incremental de XML sobre XMLPullParser: cada hijo directo de la raíz
+    # es un registro y se libera al terminar de leerlo
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(events=("start", "end"), resolve_entities=False, huge_tree=True)
+        self._depth = 0
+        self._blank = True
+
+    def feed(self, chunk: bytes):
+        self._blank = self._blank and not chunk.strip()
+        self._parser.feed(chunk)
+        return self._records()
+
+    def close(self):
+        if self._blank:
+            raise ValueError("XML body is empty")
+        self._parser.close()
+        return self._records()
+
+    def _records(self):
+        records = []
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth != 1:
+                continue
+            records.append({child.tag: child.text for child in elem if isinstance(child.tag, str)})
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return records
+
+
+def read_xml_records(file_obj):
+    # Archivos en disco: iterparse lee por su cuenta y es más rápido que
+    # alimentar XmlRecordReader por bloques
+    if not file_obj.read(1024).strip():
+        raise ValueError("XML body is empty")
+    file_obj.seek(0)
+    depth = 0
+    # Cada hijo directo de la raíz es un registro; se libera al terminar de leerlo
+    for event, elem in etree.iterparse(file_obj, events=("start", "end"), resolve_entities=False):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        yield {child.tag: child.text for child in elem if isinstance(child.tag, str)}
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+class NdjsonRecordReader:
+    # Un objeto JSON por línea; las líneas en blanco se ignoran
+
+    def __init__(self):
+        self._buffer = b""
+        self._line = 0
+        self._count = 0
+
+    def feed(self, chunk: bytes):
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        records = self._parse(lines, 1)
+        if len(self._buffer) > config.JSON_MAX_RECORD_BYTES:
+            raise ValueError(f"line {self._line + 1}: record exceeds {config.JSON_MAX_RECORD_BYTES} bytes")
+        return records
+
+    def close(self):
+        records = self._parse([self._buffer] if self._buffer else [], 0)
+        self._buffer = b""
+        if not self._count:
+            raise ValueError("NDJSON body is empty")
+        return records
+
+    def _parse(self, lines, newline: int):
+        records = []
+        for line in lines:
+            self._line += 1
+            if len(line) + newline > config.JSON_MAX_RECORD_BYTES:
+                raise ValueError(f"line {self._line}: record exceeds {config.JSON_MAX_RECORD_BYTES} bytes")
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"line {self._line}: {e}")
+        self._count += len(records)
+        return records
+
+
+def read_ndjson_records(file_obj):
+    return _read_records(file_obj, NdjsonRecordReader())
+
+
+class CsvRecordReader:
+    # Lector incremental de CSV con las mismas reglas que read_csv_batches (todo
+    # texto, celdas vacías a None, líneas en blanco ignoradas). Un registro está
+    # completo cuando su número de comillas es par: admite saltos de línea
+    # dentro de campos entre comillas.
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+        self._line = 0
+        self._header = None
+        self._count = 0
+
+    def feed(self, chunk: bytes):
+        lines = (self._pending + self._text.decode(chunk)).split("\n")
+        last = lines.pop()
+        records, rest = self._parse(lines)
+        self._pending = rest + last
+        if len(self._pending) > config.JSON_MAX_RECORD_BYTES:
+            raise ValueError(f"line {self._line + 1}: record exceeds {config.JSON_MAX_RECORD_BYTES} bytes")
+        return records
+
+    def close(self):
+        text = self._pending + self._text.decode(b"", final=True)
+        records, rest = self._parse([text] if text else [], final=True)
+        if rest:
+            raise ValueError(f"line {self._line + 1}: unterminated quoted field")
+        if not self._count:
+            raise ValueError("CSV body is empty")
+        return records
+
+    def _parse(self, lines, final: bool = False):
+        records = []
+        record = ""
+        for line in lines:
+            record += line if final else line + "\n"
+            if record.count('"') % 2:
+                continue
+            self._line += record.count("\n") + (1 if final else 0)
+            if record.strip():
+                records.append(next(csv.reader([record])))
+            record = ""
+        if records and self._header is None:
+            self._header = records.pop(0)
+        header = self._header
+        for position, values in enumerate(records):
+            if len(values) > len(header):
+                raise ValueError(f"Expected {len(header)} fields, saw {len(values)}")
+            records[position] = {name: value or None for name, value in zip(header, values + [None] * (len(header) - len(values)))}
+        self._count += len(records)
+        return records, record
+
+
+def read_csv_batches(file_obj, batch_size: int, columns=None):
+    # Lectura por bloques con el parser en C de pandas; todo se lee como texto
+    # y las celdas vacías quedan en None, igual que los elementos XML vacíos
+    empty = True
+    try:
+        chunks = pd.read_csv(
+            file_obj, dtype=str, keep_default_na=False, na_values=[""], chunksize=batch_size, encoding="utf-8-sig",
+        )
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            empty = False
+            yield chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+    except pd.errors.EmptyDataError:
+        pass
+    if empty:
+        raise ValueError("CSV body is empty")
+
+
+def read_parquet_batches(file_obj, batch_size: int, columns=REQUIRED_FIELDS):
+    # Se leen solo las columnas que usa el esquema (todas si columns es None), un row group a la vez
+    parquet = pq.ParquetFile(file_obj)
+    if columns is not None:
+        columns = [field for field in columns if field in parquet.schema_arrow.names]
+    if not parquet.metadata.num_rows:
+        raise ValueError("Parquet body is empty")
+    for group in range(parquet.num_row_groups):
+        table = parquet.read_row_group(group, columns=columns)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            yield batch.to_pylist()
+
+
+def _batched(records, batch_size: int):
+    records = iter(records)
+    while True:
+        items = list(islice(records, batch_size))
+        if not items:
+            return
+        yield items
+
+
+class FormatReader(NamedTuple):
+    # read(file_obj, batch_size, columns) produce listas de registros crudos (dicts);
+    # columns es una proyección opcional que el lector puede ignorar
+    read: Callable
+    # Valores con tipo (JSON, Parquet) o texto (XML, CSV): define las reglas de validación
+    typed: bool
+    label: str
+
+
+READERS = {}
+EXTENSIONS = {}
+CONTENT_TYPES = {}
+
+
+def register_reader(file_type: str, read, typed: bool, label: str, extensions=(), content_types=()):
+    READERS[file_type] = FormatReader(read, typed, label)
+    for extension in (file_type, *extensions):
+        EXTENSIONS[extension] = file_type
+    for content_type in content_types:
+        CONTENT_TYPES[content_type] = file_type
+
+
+def detect_file_type(filename: str, content_type: str = None):
+    # La extensión manda; el content type solo se usa si la extensión no se reconoce
+    extension = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    if content_type:
+        return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return None
+
+
+register_reader("json", lambda f, size, columns=None: _batched(read_json_records(f), size), True, "JSON", content_types=("application/json",))
+register_reader("xml", lambda f, size, columns=None: _batched(read_xml_records(f), size), False, "XML", content_types=("application/xml", "text/xml"))
+register_reader(
+    "ndjson", lambda f, size, columns=None: _batched(read_ndjson_records(f), size), True, "NDJSON", extensions=("jsonl",),
+    content_types=("application/x-ndjson", "application/jsonl", "application/json-lines"),
+)
+register_reader("csv", read_csv_batches, False, "CSV", content_types=("text/csv", "application/csv"))
+if pq is not None:
+    register_reader(
+        "parquet", read_parquet_batches, True, "Parquet", extensions=("pq",),
+        content_types=("application/vnd.apache.parquet", "application/x-parquet"),
+    )
+
+
+# Lectores incrementales (feed/close) para validar un stream sin archivo en disco
+STREAM_READERS = {"json": JsonRecordReader, "xml": XmlRecordReader, "ndjson": NdjsonRecordReader, "csv": CsvRecordReader}
+
+
+def read_batches(file_obj, file_type: str, batch_size: int = None, schema=DEFAULT_SCHEMA):
+    if file_type not in READERS:
+        raise ValueError("Unsupported file type")
+    columns = REQUIRED_FIELDS if schema.is_default else compile_schema(schema, READERS[file_type].typed).projection
+    return READERS[file_type].read(file_obj, batch_size or config.RECORD_BATCH_SIZE, columns)
+
+
+_MISSING = object()
+# Enteros en texto que acepta pydantic (modo lax) y los que acepta int() en XML
+JSON_INT_PATTERN = r"\s*[+-]?[0-9]+(?:_[0-9]+)*(?:\.0+)?\s*"
+XML_INT_PATTERN = r"\s*[+-]?\d+(?:_\d+)*\s*"
+INT64_LIMIT = 2 ** 63
+# Rango de la columna INTEGER de company_data donde se guarda field2
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+RANGE_REASON = f"Input should be between {INT32_MIN} and {INT32_MAX}"
+
+
+def _types(values):
+    return np.fromiter(map(type, values), dtype=object, count=len(values))
+
+
+def _parse_int_strings(values, mask, pattern):
+    # Devuelve la máscara de textos válidos y sus valores enteros. Camino rápido
+    # en C para dígitos ASCII; el resto se valida con la expresión regular.
+    strings = values[mask]
+    valid = np.zeros(len(strings), dtype=bool)
+    parsed = np.empty(len(strings), dtype=object)
+    pending = np.ones(len(strings), dtype=bool)
+    try:
+        raw = strings.astype("S")
+    except UnicodeEncodeError:
+        raw = None
+    if raw is not None:
+        fast = np.char.isdigit(raw) & (np.char.str_len(raw) <= 18)
+        parsed[fast] = raw[fast].astype(np.int64).tolist()
+        valid |= fast
+        pending = ~fast
+    if pending.any():
+        positions = np.flatnonzero(pending)
+        rest = pd.Series(strings[positions], dtype=object)
+        ok = rest.str.fullmatch(pattern).to_numpy(dtype=bool)
+        cleaned = rest[ok].str.strip().str.replace("_", "", regex=False).str.replace(r"\.0+$", "", regex=True)
+        parsed[positions[ok]] = [int(value) for value in cleaned]
+        valid[positions[ok]] = True
+    return valid, parsed[valid]
+
+
+def _out_of_range(values):
+    # Máscara de los enteros que no entran en la columna field2: se rechazan al
+    # validar y no como error de la base después de cargar el lote en staging
+    values = np.asarray(values, dtype=object)
+    try:
+        ints = values.astype(np.int64)
+    except OverflowError:
+        return np.array([not INT32_MIN <= value <= INT32_MAX for value in values], dtype=bool)
+    return (ints < INT32_MIN) | (ints > INT32_MAX)
+
+
+def _column(records, field):
+    return np.fromiter([record.get(field, _MISSING) for record in records], dtype=object, count=len(records))
+
+
+def _validate_json_columns(items, errors):
+    n = len(items)
+    not_object = _types(items) != dict
+    for index in np.flatnonzero(not_object):
+        errors.setdefault(index, "each record must be an object")
+    records = [{} if bad else item for item, bad in zip(items, not_object)]
+
+    columns = {}
+    for field in REQUIRED_FIELDS:
+        values = _column(records, field)
+        types = _types(values)
+        missing = types == type(_MISSING)
+        invalid = np.zeros(n, dtype=bool)
+        if field == "field2":
+            parsed = values.copy()
+            is_bool = types == bool
+            parsed[is_bool] = [int(value) for value in values[is_bool]]
+            is_int = (types == int) | is_bool
+            is_float = types == float
+            if is_float.any():
+                floats = values[is_float].astype(float)
+                ok = np.isfinite(floats) & (np.floor(floats) == floats) & (np.abs(floats) < INT64_LIMIT)
+                float_positions = np.flatnonzero(is_float)
+                parsed[float_positions[ok]] = [int(value) for value in floats[ok]]
+                invalid[float_positions[~ok]] = True
+            is_str = types == str
+            if is_str.any():
+                ok, converted = _parse_int_strings(values, is_str, JSON_INT_PATTERN)
+                str_positions = np.flatnonzero(is_str)
+                parsed[str_positions[ok]] = converted
+                invalid[str_positions[~ok]] = True
+            invalid |= ~(is_int | is_float | is_str | missing)
+            valid_positions = np.flatnonzero(~(invalid | missing))
+            for index in valid_positions[_out_of_range(parsed[valid_positions])]:
+                errors.setdefault(index, f"{field}: {RANGE_REASON}")
+            values = parsed
+            reason = "Input should be a valid integer"
+        else:
+            invalid = ~((types == str) | missing)
+            reason = "Input should be a valid string"
+        for index in np.flatnonzero(missing):
+            errors.setdefault(index, f"{field}: Field required")
+        for index in np.flatnonzero(invalid):
+            errors.setdefault(index, f"{field}: {reason}")
+        columns[field] = values
+    return columns
+
+
+def _validate_xml_columns(items, errors):
+    n = len(items)
+    columns = {}
+    for field in REQUIRED_FIELDS:
+        columns[field] = _column(items, field)
+    missing = np.zeros(n, dtype=bool)
+    for field in REQUIRED_FIELDS:
+        missing |= _types(columns[field]) == type(_MISSING)
+    for index in np.flatnonzero(missing):
+        errors.setdefault(index, "Missing required fields: field1, field2, or field3")
+
+    # field2: vacío -> 0; el resto debe poder convertirse con int()
+    values = columns["field2"]
+    types = _types(values)
+    empty = (types == type(None)) | (values == "")
+    present = (types == str) & ~empty
+    parsed = values.copy()
+    parsed[empty] = 0
+    if present.any():
+        ok, converted = _parse_int_strings(values, present, XML_INT_PATTERN)
+        positions = np.flatnonzero(present)
+        parsed[positions[ok]] = converted
+        for index in positions[~ok]:
+            errors.setdefault(index, f"Invalid field2 value: {values[index]}")
+        for index in positions[ok][_out_of_range(converted)]:
+            errors.setdefault(index, f"Invalid field2 value: {values[index]} ({RANGE_REASON})")
+    columns["field2"] = parsed
+
+    for field in ("field1", "field3"):
+        values = columns[field]
+        values[_types(values) == type(None)] = "N/A"
+    return columns
+
+
+def validate_batch(items, file_type: str, offset: int = 0, schema=DEFAULT_SCHEMA):
+    # Valida y normaliza un lote de registros crudos por columnas (field2 entero,
+    # vacíos a "N/A" en XML). Devuelve las columnas normalizadas y la lista
+    # ordenada de (posición del registro, motivo) de los registros inválidos.
+    # Los esquemas registrados por compañía usan su validador compilado.
+    if not schema.is_default:
+        validator = compile_schema(schema, READERS[file_type].typed)
+        columns, errors = validator.validate(items, offset)
+        if errors or validator.columns["field2"] is None:
+            return columns, errors
+        out_of_range = np.flatnonzero(_out_of_range(columns["field2"]))
+        return columns, [(offset + index, f"{validator.columns['field2']}: {RANGE_REASON}") for index in out_of_range]
+    errors = {}
+    if READERS[file_type].typed:
+        columns = _validate_json_columns(items, errors)
+    else:
+        columns = _validate_xml_columns(items, errors)
+    return columns, [(offset + index, errors[index]) for index in sorted(errors)]
+
+
+def error_message(item, reason: str, file_type: str, schema=DEFAULT_SCHEMA):
+    # Mensaje con el mismo formato que la validación registro por registro
+    reader = READERS[file_type]
+    if reader.typed and isinstance(item, dict) and schema.is_default:
+        try:
+            DataModel(**item)
+        except ValidationError as e:
+            return f"Invalid {reader.label}: {e}"
+    return f"Invalid {reader.label}: {reason}"
+
+
+def row_hash(field1, field2, field3, extra=None):
+    # Hash estable del contenido persistido de una fila (deduplicación y modo merge)
+    content = f"{field1}\x1f{field2}\x1f{field3}"
+    if extra:
+        content += "\x1f" + json.dumps(extra, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def batch_hashes(columns):
+    if "extra" in columns:
+        return [row_hash(*row) for row in zip(columns["field1"], columns["field2"], columns["field3"], columns["extra"])]
+    return [row_hash(*row) for row in zip(columns["field1"], columns["field2"], columns["field3"])]
+
+
+def dedup_batch(columns, hashes, seen):
+    # Conserva la primera aparición de cada fila, igual que drop_duplicates.
+    # Con seen=None no se descarta nada (la deduplicación la hace quien consume)
+    if seen is None:
+        columns["row_hash"] = hashes
+        return columns
+    keep = []
+    for position, key in enumerate(hashes):
+        if key not in seen:
+            seen.add(key)
+            keep.append(position)
+    if len(keep) < len(hashes):
+        columns = {field: np.asarray(values, dtype=object)[keep] for field, values in columns.items()}
+        hashes = [hashes[position] for position in keep]
+    columns["row_hash"] = hashes
+    return columns
+
+
+def validated_batches(batches, file_type: str, seen, schema=DEFAULT_SCHEMA):
+    offset = 0
+    batches = iter(batches)
+    while True:
+        # validate: parseo del bloque y validación; transform: hash y deduplicación
+        with metrics.stage("validate") as counts:
+            items = next(batches, None)
+            if items is None:
+                break
+            counts["rows"] = len(items)
+            columns, errors = validate_batch(items, file_type, offset, schema)
+            if errors:
+                index, reason = errors[0]
+                raise ValueError(error_message(items[index - offset], reason, file_type, schema))
+        offset += len(items)
+        with metrics.stage("transform") as counts:
+            batch = dedup_batch(columns, batch_hashes(columns), seen)
+            counts["rows"] = len(batch["row_hash"])
+        yield batch
+
+
+def iter_batches(file_obj, file_type: str, batch_size: int = None, schema=DEFAULT_SCHEMA, dedup: bool = True):
+    # Una sola pasada: parseo incremental, validación por columnas, normalización
+    # y eliminación de duplicados. Produce lotes de columnas de forma perezosa.
+    # Los archivos grandes en disco se reparten entre varios procesos.
+    from backend.parallel import iter_parallel_batches, plan_ranges
+
+    batch_size = batch_size or config.RECORD_BATCH_SIZE
+    seen = set() if dedup else None
+    try:
+        plan = plan_ranges(file_obj, file_type)
+        if plan is not None:
+            yield from iter_parallel_batches(plan, file_type, batch_size, seen, schema)
+        else:
+            file_obj.seek(0)
+            yield from validated_batches(read_batches(file_obj, file_type, batch_size, schema), file_type, seen, schema)
+    except (etree.XMLSyntaxError, ValueError) as e:
+        # Errores del parser (incluido pyarrow.ArrowInvalid, que es un ValueError)
+        prefix = f"Invalid {READERS[file_type].label}" if file_type in READERS else "Invalid input"
+        if str(e).startswith(prefix):
+            raise
+        raise ValueError(f"{prefix}: {e}")
+
+
+def batch_records(columns):
+    # Registros de un lote de columnas; extra solo existe con esquemas de compañía
+    if "extra" not in columns:
+        for field1, field2, field3, key in zip(columns["field1"], columns["field2"], columns["field3"], columns["row_hash"]):
+            yield {"field1": field1, "field2": field2, "field3": field3, "row_hash": key}
+        return
+    for field1, field2, field3, extra, key in zip(
+        columns["field1"], columns["field2"], columns["field3"], columns["extra"], columns["row_hash"]
+    ):
+        yield {"field1": field1, "field2": field2, "field3": field3, "extra": extra, "row_hash": key}
+
+
+def iter_records(file_obj, file_type: str, schema=DEFAULT_SCHEMA):
+    # Registros normalizados uno a uno, a partir de los lotes validados
+    for columns in iter_batches(file_obj, file_type, schema=schema):
+        yield from batch_records(columns)
@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from backend import config
+from backend.database import async_engine
+from backend.models.company_data import CompanyData
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+EXPORT_FIELDS = ("id", "status", "file_type", "batch_id", "created_at", "field1", "field2", "field3", "extra")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+
+def _export_query(company_name: str, status=None, created_after=None, created_before=None):
+    query = select(*[getattr(CompanyData, field) for field in EXPORT_FIELDS]).where(CompanyData.company_name == company_name)
+    if status:
+        query = query.where(CompanyData.status == status)
+    else:
+        # Igual que /status: los lotes aún no publicados no se exportan
+        query = query.where(CompanyData.status != "staged")
+    if created_after:
+        query = query.where(CompanyData.created_at >= created_after)
+    if created_before:
+        query = query.where(CompanyData.created_at < created_before)
+    return query.order_by(CompanyData.id)
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _json_text(value):
+    # extra en formatos planos (CSV, columna string de Parquet)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")) if value is not None else None
+
+
+class CsvEncoder:
+    def __init__(self):
+        self.header = True
+
+    def encode(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if self.header:
+            writer.writerow(EXPORT_FIELDS)
+            self.header = False
+        created_at = EXPORT_FIELDS.index("created_at")
+        writer.writerows(
+            row[:created_at] + (_isoformat(row[created_at]),) + row[created_at + 1:-1] + (_json_text(row[-1]),) for row in rows
+        )
+        return buffer.getvalue().encode()
+
+    def finish(self):
+        return b""
+
+
+class NdjsonEncoder:
+    def __init__(self):
+        self._dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def encode(self, rows):
+        created_at = EXPORT_FIELDS.index("created_at")
+        dumps = self._dumps
+        return "".join(
+            dumps(dict(zip(EXPORT_FIELDS, row[:created_at] + (_isoformat(row[created_at]),) + row[created_at + 1:]))) + "\n"
+            for row in rows
+        ).encode()
+
+    def finish(self):
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    # Destino del ParquetWriter: acumula lo escrito hasta que se entrega al cliente
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    # Un row group por bloque del cursor, construido columna a columna como RecordBatch de Arrow
+    def __init__(self):
+        self.schema = pa.schema([
+            ("id", pa.int64()), ("status", pa.string()), ("file_type", pa.string()), ("batch_id", pa.int64()),
+            ("created_at", pa.timestamp("us")), ("field1", pa.string()), ("field2", pa.int64()), ("field3", pa.string()),
+            ("extra", pa.string()),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self.schema, compression="snappy")
+
+    def encode(self, rows):
+        columns = list(zip(*rows))
+        columns[-1] = [_json_text(value) for value in columns[-1]]
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, self.schema)], schema=self.schema
+        )
+        self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def finish(self):
+        self._writer.close()
+        return self._sink.drain()
+
+
+ENCODERS = {"csv": CsvEncoder, "ndjson": NdjsonEncoder, "parquet": ParquetEncoder}
+
+
+async def _stream_export(query, encoder):
+    # Cursor del lado del servidor por bloques de EXPORT_CHUNK_SIZE; cada bloque se
+    # codifica fuera del event loop y se envía antes de leer el siguiente.
+    # Conexión Core sin sesión ORM: las filas no pasan por el procesamiento del ORM.
+    async with async_engine.connect() as connection:
+        result = await connection.stream(query.execution_options(yield_per=config.EXPORT_CHUNK_SIZE))
+        async for rows in result.partitions():
+            data = await run_in_threadpool(encoder.encode, [tuple(row) for row in rows])
+            if data:
+                yield data
+    data = await run_in_threadpool(encoder.finish)
+    if data:
+        yield data
+
+
+@router.get("/export/{company_name}")
+async def export_company_data(
+    company_name: str,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    status: str = None,
+    created_after: datetime = None,
+    created_before: datetime = None,
+):
+    logger.info(f"Export endpoint called for company: {company_name}, format: {format}")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    query = _export_query(company_name, status, created_after, created_before)
+    return StreamingResponse(
+        _stream_export(query, ENCODERS[format]()),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{company_name}.{format}"'},
+    )
@@ -0,0 +1,37 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.admission import limits, summarize, usage_query
+from backend.database import get_async_db
+from backend.idempotency import cache_stats
+from backend.models.job import Job
+from backend.models.job_file import JobFile
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/jobs/cache")
+def get_upload_cache_stats():
+    return cache_stats()
+
+@router.get("/jobs/budget")
+async def get_job_budget(db: AsyncSession = Depends(get_async_db)):
+    # Uso actual del presupuesto de admisión: jobs activos y sus bytes, en total y por compañía
+    usage = summarize((await db.execute(usage_query())).all())
+    return {"limits": limits(), **usage}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = job.to_dict()
+    # Resultados por archivo de los uploads con varias partes o comprimidos
+    files = (await db.scalars(select(JobFile).where(JobFile.job_id == job_id).order_by(JobFile.id))).all()
+    if files:
+        result["files"] = [job_file.to_dict() for job_file in files]
+    return result
@@ -0,0 +1,55 @@
+import time
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import metrics
+from backend.admission import summarize, usage_query
+from backend.database import get_async_db
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(db: AsyncSession = Depends(get_async_db)):
+    # La cola, los jobs en curso y los uploads en curso se leen de la base al momento
+    # del scrape: valen para todos los workers aunque corran en otros procesos o máquinas
+    usage = summarize((await db.execute(usage_query())).all())
+    gauges = {
+        "ingest_jobs_queued": ("Jobs waiting for a worker", usage["jobs"] - usage["running"] - usage["uploading"]),
+        "ingest_jobs_running": ("Jobs being processed by a worker", usage["running"]),
+        "ingest_uploads_in_progress": ("Uploads being received that hold an admission reservation", usage["uploading"]),
+        "ingest_inflight_bytes": ("Bytes of uploads in progress, queued and running jobs (admission budget usage)", usage["bytes"]),
+    }
+    return Response(metrics.render(gauges), media_type=CONTENT_TYPE_LATEST)
+
+
+class LatencyMiddleware:
+    # Middleware ASGI (sin BaseHTTPMiddleware, que envuelve cada respuesta): mide
+    # hasta el último byte, incluidas las respuestas en streaming. La etiqueta es
+    # la plantilla de la ruta (/jobs/{job_id}) para acotar la cardinalidad.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            metrics.HTTP_SECONDS.labels(
+                scope["method"], route.path if route is not None else "unmatched", str(status)
+            ).observe(time.perf_counter() - start)
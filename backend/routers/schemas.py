@@ -0,0 +1,43 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.database import get_async_db, get_db
+from backend.schemas import DEFAULT_DEFINITION, SchemaSpec, compile_schema, get_schema, register_schema
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/cache/schemas")
+def get_schema_cache_stats():
+    # Validadores compilados en este proceso (los workers de ingesta tienen su propia caché)
+    return compile_schema.cache_info()._asdict()
+
+@router.post("/schemas/{company_name}")
+def create_schema(company_name: str, spec: SchemaSpec, db: Session = Depends(get_db)):
+    # Registra una versión nueva; los uploads encolados después la usan
+    try:
+        row = register_schema(db, company_name, spec)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Schema was modified concurrently, retry")
+    logger.info(f"Schema version {row.version} registered for company: {company_name}")
+    return row.to_dict()
+
+@router.get("/schemas/{company_name}")
+async def get_active_schema(company_name: str, db: AsyncSession = Depends(get_async_db)):
+    row = await get_schema(db, company_name)
+    if row is None:
+        return {"company_name": company_name, "version": 0, **DEFAULT_DEFINITION, "created_at": None}
+    return row.to_dict()
+
+@router.get("/schemas/{company_name}/{version}")
+async def get_schema_version(company_name: str, version: int, db: AsyncSession = Depends(get_async_db)):
+    row = await get_schema(db, company_name, version)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Schema version not found")
+    return row.to_dict()
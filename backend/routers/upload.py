@@ -1,16 +1,36 @@
-import io
+import os
+import json
+import hashlib
+import shutil
+import tempfile
 import pandas as pd
-import xml.etree.ElementTree as ET
 import logging
-from datetime import datetime, timezone
+from datetime import datetime
+from typing import List
+from urllib.parse import parse_qs
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, ValidationError
-from lxml import etree
+from starlette.concurrency import run_in_threadpool
 
-from backend.database import SessionLocal
+from backend import config, metrics, status_cache
+from backend.admission import AdmissionRejected, admission_lock, admit, release, reserve
+from backend.archives import detect_archive_type, iter_parsed_members, iter_upload_members, part_name
+from backend.database import AsyncSessionLocal, SessionLocal, get_async_db
+from backend.idempotency import IdempotencyConflict, find_cached_job, upload_lock
+from backend.loader import (
+    bulk_load, bump_company_version, clear_batch_marker, fail_batch, promote_batch, reset_batch, set_batch_status,
+)
 from backend.models.company_data import CompanyData
+from backend.models.company_status_summary import CompanyStatusSummary
+from backend.models.company_version import CompanyVersion
+from backend.models.job import Job
+from backend.models.job_file import JobFile
+from backend.pipeline import REQUIRED_FIELDS, batch_records, dedup_batch, detect_file_type, iter_records
+from backend.schemas import active_schema
 
 logger = logging.getLogger(__name__)
 
@@ -23,200 +43,443 @@ def get_db():
     finally:
         db.close()
 
-class DataModel(BaseModel):
-    field1: str
-    field2: int
-    field3: str
+def validate_content(file_obj, file_type: str):
+    for _ in iter_records(file_obj, file_type):
+        pass
+    return True
 
-def validate_content(file_content: bytes, file_type: str):
-    import json
-    if file_type == "json":
-        try:
-            data = json.loads(file_content.decode("utf-8"))
-            if not data:
-                raise ValueError("JSON body is empty")
-            # Soporta {"records": [...]} o lista directa
-            if isinstance(data, dict) and "records" in data:
-                for item in data["records"]:
-                    DataModel(**item)
-            elif isinstance(data, list):
-                for item in data:
-                    DataModel(**item)
-            else:
-                DataModel(**data)
-            return True
-        except (json.JSONDecodeError, ValidationError) as e:
-            raise ValueError(f"Invalid JSON: {e}")
-    elif file_type == "xml":
-        try:
-            if not file_content.strip():
-                raise ValueError("XML body is empty")
-            # Validar sintaxis XML
-            root = ET.fromstring(file_content)
-            # Validar campos requeridos parseando directamente el XML
-            for child in root:
-                record_dict = {}
-                for subchild in child:
-                    record_dict[subchild.tag] = subchild.text
-                # Validar que los campos requeridos existan
-                if "field1" not in record_dict or "field2" not in record_dict or "field3" not in record_dict:
-                    raise ValueError("Missing required fields: field1, field2, or field3")
-                # Validar con DataModel
-                try:
-                    field2_value = int(record_dict["field2"]) if record_dict["field2"] else 0
-                except (ValueError, TypeError):
-                    raise ValueError(f"Invalid field2 value: {record_dict.get('field2')}")
-                DataModel(field1=record_dict["field1"] or "N/A", field2=field2_value, field3=record_dict["field3"] or "N/A")
-            return True
-        except (etree.XMLSyntaxError, ET.ParseError, ValueError, ValidationError) as e:
-            raise ValueError(f"Invalid XML: {e}")
-    else:
-        raise ValueError("Unsupported file type")
-
-def transform_data(file_content: bytes, file_type: str):
-    import json
-    if file_type == "json":
-        parsed = json.loads(file_content.decode("utf-8"))
-        if isinstance(parsed, dict) and "records" in parsed:
-            records = parsed["records"]
-        elif isinstance(parsed, list):
-            records = parsed
-        elif isinstance(parsed, dict):
-            records = [parsed]
-        else:
-            raise ValueError("Unsupported JSON structure")
-        df = pd.DataFrame(records)
-    elif file_type == "xml":
-        try:
-            root = ET.fromstring(file_content.decode("utf-8"))
-            data = []
-            for child in root:
-                data.append({subchild.tag: subchild.text for subchild in child})
-            df = pd.DataFrame(data)
-        except ET.ParseError as e:
-            raise ValueError(f"Invalid XML format: {e}")
-    else:
-        raise ValueError("Unsupported file type. Only JSON and XML are allowed.")
-
-    df.drop_duplicates(inplace=True)
-    # Asegura columnas requeridas
-    for col in ["field1", "field2", "field3"]:
-        if col not in df.columns:
-            df[col] = None
-
-    # field2 a entero, inválidos a 0
-    df["field2"] = pd.to_numeric(df["field2"], errors="coerce").fillna(0).astype(int)
-    df["field1"] = df["field1"].fillna("N/A").astype(str)
-    df["field3"] = df["field3"].fillna("N/A").astype(str)
+def transform_data(file_obj, file_type: str):
+    df = pd.DataFrame(list(iter_records(file_obj, file_type)), columns=list(REQUIRED_FIELDS))
+    df["field2"] = df["field2"].astype(int)
     return df
 
-def load_data_to_db(df, db: Session, company_name: str, status: str = "processed", file_type: str = None):
-    for _, row in df.iterrows():
-        record = CompanyData(
-            company_name=company_name,
-            file_type=file_type,
-            status=status,
-            created_at=datetime.now(timezone.utc),
-            field1=row["field1"],
-            field2=int(row["field2"]),
-            field3=row["field3"],
-        )
-        db.add(record)
+def load_data_to_db(records, db: Session, company_name: str, status: str = "processed", file_type: str = None, batch_id: int = None,
+                    skip_conflicts: bool = False):
+    # Acepta un DataFrame o cualquier iterable de registros normalizados
+    stats = bulk_load(records, db, company_name, status=status, file_type=file_type, batch_id=batch_id, skip_conflicts=skip_conflicts)
+    db.commit()
+    return stats
+
+def _start_batch(db: Session, company_name: str, file_type: str, batch_id: int):
+    # Un reintento del job empieza sin las filas de intentos anteriores del mismo lote
+    if reset_batch(db, company_name, batch_id):
+        logger.info(f"Batch {batch_id} retried for {company_name}: discarded rows of the previous attempt")
+    # Status inicial: uploaded (una fila marcador por lote)
+    marker = [{"field1": "N/A", "field2": 0, "field3": "N/A"}]
+    bump_company_version(db, company_name)
+    load_data_to_db(marker, db, company_name, status="uploaded", file_type=file_type, batch_id=batch_id)
+    logger.info(f"Batch {batch_id} created with status 'uploaded' for {company_name}")
+
+    # Status: processing
+    set_batch_status(db, company_name, batch_id, "uploaded", "processing")
+    bump_company_version(db, company_name)
     db.commit()
+    logger.info(f"Status updated to 'processing' for {company_name}")
 
-def process_in_background(company_name: str, file_content: bytes, file_type: str):
-    logger.info(f"Starting background processing for company: {company_name}, file_type: {file_type}")
+def _fail_batch(db: Session, company_name: str, batch_id: int):
+    try:
+        db.rollback()
+    except Exception:
+        pass
+    # Marca como failed solo el lote actual
+    try:
+        bump_company_version(db, company_name)
+        fail_batch(db, company_name, batch_id)
+    except Exception:
+        pass
+
+def process_in_background(company_name: str, file_obj, file_type: str, batch_id: int, mode: str = "replace"):
+    logger.info(f"Starting background processing for company: {company_name}, file_type: {file_type}, batch: {batch_id}, mode: {mode}")
     db = SessionLocal()
     try:
-        # Status inicial: uploaded
-        df_dummy = pd.DataFrame([{"field1": "N/A", "field2": 0, "field3": "N/A"}])
-        load_data_to_db(df_dummy, db, company_name, status="uploaded", file_type=file_type)
-        logger.info(f"Initial records created with status 'uploaded' for {company_name}")
-
-        # Validar
-        validate_content(file_content, file_type)
-        logger.info(f"Validation successful for {company_name}")
-
-        # Status: processing
-        records = db.query(CompanyData).filter(CompanyData.company_name == company_name, CompanyData.status == "uploaded").all()
-        for record in records:
-            record.status = "processing"
-        db.commit()
-        logger.info(f"Status updated to 'processing' for {company_name}")
-
-        # Transform
-        df = transform_data(file_content, file_type)
-        logger.info(f"Transformation successful for {company_name}")
-
-        # Eliminar registros anteriores antes de crear los nuevos con status "processed"
-        old_records = db.query(CompanyData).filter(
-            CompanyData.company_name == company_name,
-            CompanyData.status.in_(["uploaded", "processing"])
-        ).all()
-        for old_record in old_records:
-            db.delete(old_record)
-        db.commit()
-        logger.info(f"Old records deleted for {company_name}")
+        # Versión vigente del esquema de la compañía; el validador compilado se reutiliza entre uploads
+        schema = active_schema(db, company_name)
+        _start_batch(db, company_name, file_type, batch_id)
 
-        # Load con status "processed"
-        load_data_to_db(df, db, company_name, status="processed", file_type=file_type)
-        logger.info(f"ETL completed successfully for {company_name}")
+        if mode == "merge":
+            # Merge: solo se insertan las filas cuyo contenido no está publicado;
+            # todo el lote se confirma en una transacción junto con el marcador.
+            # El marcador y la versión se actualizan al final: los locks de sus
+            # filas duran solo hasta el commit y no toda la carga.
+            stats = bulk_load(iter_records(file_obj, file_type, schema), db, company_name, status="processed", file_type=file_type,
+                              batch_id=batch_id, skip_conflicts=True)
+            clear_batch_marker(db, company_name, batch_id)
+            bump_company_version(db, company_name)
+            db.commit()
+            stats["superseded"] = False
+        else:
+            # Validar, transformar y cargar en staging en una sola pasada sobre el archivo
+            stats = load_data_to_db(iter_records(file_obj, file_type, schema), db, company_name, status="staged", file_type=file_type, batch_id=batch_id)
+            # Publicar el lote reemplazando los datos anteriores de la compañía
+            stats["superseded"] = not promote_batch(db, company_name, batch_id)
+        stats["schema_version"] = schema.version
+        logger.info(f"ETL completed successfully for {company_name}: {stats['inserted']} rows written, {stats['skipped']} skipped")
+        return stats
 
     except Exception as e:
         logger.error(f"Error in background processing for {company_name}: {e}")
+        _fail_batch(db, company_name, batch_id)
+        raise
+    finally:
+        file_obj.close()
+        db.close()
+
+def _member_records(batches, seen):
+    # Filas de un archivo ya validado, sin las repetidas en el mismo archivo ni en anteriores del job
+    for batch in batches:
+        with metrics.stage("transform") as counts:
+            batch = dedup_batch(batch, batch["row_hash"], seen)
+            counts["rows"] = len(batch["row_hash"])
+        yield from batch_records(batch)
+
+def process_files_in_background(company_name: str, path: str, job_type: str, batch_id: int, mode: str = "replace"):
+    # Varios archivos (partes del form o miembros de un .zip/.tar.gz) en un solo lote:
+    # se validan en paralelo y se cargan todos en una transacción. Los archivos
+    # inválidos se informan en job_files y no impiden cargar el resto.
+    logger.info(f"Starting batch processing for company: {company_name}, type: {job_type}, batch: {batch_id}, mode: {mode}")
+    db = SessionLocal()
+    results = []
+    try:
+        schema = active_schema(db, company_name)
+        _start_batch(db, company_name, job_type, batch_id)
+
+        seen = set()
+        stats = {"rows": 0, "inserted": 0}
+        for name, file_type, size, result in iter_parsed_members(iter_upload_members(path, job_type), schema):
+            job_file = JobFile(job_id=batch_id, name=name, file_type=file_type, size_bytes=size, state="failed", error=result.get("error"))
+            if "batches" in result:
+                loaded = bulk_load(
+                    _member_records(result["batches"], seen), db, company_name, status="processed" if mode == "merge" else "staged",
+                    file_type=file_type, batch_id=batch_id, skip_conflicts=mode == "merge",
+                )
+                job_file.state = "completed"
+                job_file.records_read = result["records"]
+                job_file.records_loaded = loaded["inserted"]
+                job_file.records_skipped = result["records"] - loaded["inserted"]
+                stats["rows"] += result["records"]
+                stats["inserted"] += loaded["inserted"]
+            results.append(job_file)
+
+        failed = sum(1 for job_file in results if job_file.state == "failed")
+        if failed == len(results):
+            raise ValueError(f"No valid files in upload ({failed} failed)")
+        stats["skipped"] = stats["rows"] - stats["inserted"]
+        stats["error"] = f"{failed} of {len(results)} files failed" if failed else None
+        stats["files"] = len(results)
+        stats["schema_version"] = schema.version
+        db.add_all(results)
+        if mode == "merge":
+            # Como en process_in_background: marcador y versión justo antes del commit
+            clear_batch_marker(db, company_name, batch_id)
+            bump_company_version(db, company_name)
+            db.commit()
+            stats["superseded"] = False
+        else:
+            stats["superseded"] = not promote_batch(db, company_name, batch_id)
+        logger.info(f"Batch {batch_id} completed for {company_name}: {len(results)} files, {failed} failed, {stats['inserted']} rows written")
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error in batch processing for {company_name}: {e}")
+        _fail_batch(db, company_name, batch_id)
+        # Los resultados por archivo se conservan aunque el lote falle
         try:
-            db.rollback()
-        except Exception:
-            pass
-        # Marca como failed si hay error
-        try:
-            fresh_db = SessionLocal()
-            records = fresh_db.query(CompanyData).filter(CompanyData.company_name == company_name).all()
-            for rec in records:
-                rec.status = "failed"
-            fresh_db.commit()
-            fresh_db.close()
+            db.add_all(results)
+            db.commit()
         except Exception:
-            pass
+            db.rollback()
+        raise
     finally:
         db.close()
 
+async def save_upload(file: UploadFile, directory: str = None, name: str = None, limit: int = None):
+    # Copia el upload por bloques a UPLOAD_DIR sin cargarlo completo en memoria;
+    # el archivo queda en disco hasta que un worker procese el job
+    limit = config.MAX_UPLOAD_BYTES if limit is None else limit
+    directory = directory or config.UPLOAD_DIR
+    os.makedirs(directory, exist_ok=True)
+    if name:
+        target = open(os.path.join(directory, name), "wb")
+    else:
+        target = tempfile.NamedTemporaryFile(dir=directory, suffix=".upload", delete=False)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with metrics.stage("receive") as counts:
+            while True:
+                chunk = await file.read(config.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"File exceeds maximum size of {config.MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                target.write(chunk)
+            counts["size"] = size
+    except BaseException:
+        target.close()
+        os.unlink(target.name)
+        raise
+    target.close()
+    return target.name, size, digest.hexdigest()
+
+def remove_upload(path: str):
+    # Un archivo o, en uploads con varias partes, el directorio de las partes
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def _part_type(file: UploadFile):
+    # Formato por extensión o, si no se reconoce, por content type (ver register_reader)
+    return detect_archive_type(file.filename, file.content_type) or detect_file_type(file.filename, file.content_type)
+
+async def _save_parts(files: List[UploadFile], file_types):
+    # Cada parte en un directorio propio; el límite de tamaño aplica a la suma
+    directory = tempfile.mkdtemp(dir=config.UPLOAD_DIR, suffix=".batch")
+    size = 0
+    digests = []
+    try:
+        for index, (file, file_type) in enumerate(zip(files, file_types)):
+            _, part_size, part_sha256 = await save_upload(
+                file, directory, part_name(index, file_type, file.filename), limit=config.MAX_UPLOAD_BYTES - size
+            )
+            size += part_size
+            digests.append(part_sha256)
+    except BaseException:
+        remove_upload(directory)
+        raise
+    return directory, size, hashlib.sha256("".join(digests).encode()).hexdigest()
+
+def _reserve(company_name: str, size: int):
+    with SessionLocal() as db:
+        return reserve(db, company_name, size)
+
+def _release(reservation_id: int):
+    with SessionLocal() as db:
+        release(db, reservation_id)
+        db.commit()
+
+class AdmissionMiddleware:
+    # Middleware ASGI: FastAPI lee el formulario completo antes de llamar a
+    # process_file, así que el presupuesto se comprueba aquí con Content-Length,
+    # sin leer el cuerpo. La reserva cuenta como un job en vuelo mientras llegan
+    # los bloques; _enqueue la cambia por el job y, si no, se libera al terminar.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/process":
+            await self.app(scope, receive, send)
+            return
+        company_name = parse_qs(scope["query_string"].decode("latin-1")).get("company_name", [None])[0]
+        if not company_name:
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length", b"0")
+        size = int(content_length) if content_length.isdigit() else 0
+        try:
+            reservation_id = await run_in_threadpool(_reserve, company_name, size)
+        except AdmissionRejected as e:
+            response = JSONResponse({"detail": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+        scope.setdefault("state", {})["admission_reservation"] = reservation_id
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await run_in_threadpool(_release, reservation_id)
+
 @router.post("/process")
 async def process_file(
+    request: Request,
     company_name: str,
-    file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None,
+    file: List[UploadFile] = File(...),
+    mode: str = Query("replace", pattern="^(replace|merge)$"),
+    idempotency_key: str = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
 ):
-    logger.info(f"Process endpoint called for company: {company_name}, file: {file.filename}")
-    file_content = await file.read()
-    file_type = file.filename.split(".")[-1].lower()
+    files = file
+    logger.info(f"Process endpoint called for company: {company_name}, files: {', '.join(f.filename or '' for f in files)}")
+    file_types = [_part_type(f) for f in files]
+    unsupported = [f.filename for f, file_type in zip(files, file_types) if file_type is None]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {', '.join(unsupported)}")
 
-    if file_type not in ("json", "xml"):
-        raise HTTPException(status_code=400, detail="Unsupported file type")
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    if len(files) == 1:
+        file_type = file_types[0]
+        file_path, size, content_sha256 = await save_upload(files[0])
+    else:
+        # Varias partes: un solo job de tipo "batch" con resultados por archivo
+        file_type = "batch"
+        file_path, size, content_sha256 = await _save_parts(files, file_types)
+    logger.info(f"Upload received for company: {company_name}, {len(files)} files, {size} bytes")
 
-    background_tasks.add_task(process_in_background, company_name, file_content, file_type)
-    return {"message": "Processing started in background"}
+    # La búsqueda en la caché, la admisión y la inserción esperan locks: fuera del event loop
+    reservation_id = getattr(request.state, "admission_reservation", None)
+    return await run_in_threadpool(
+        _enqueue, db, company_name, file_type, file_path, size, content_sha256, mode, idempotency_key, reservation_id
+    )
+
+def _enqueue(db: Session, company_name: str, file_type: str, file_path: str, size: int, content_sha256: str, mode: str,
+             idempotency_key: str = None, reservation_id: int = None):
+    # Búsqueda en la caché, admisión e inserción del job en una sola transacción
+    # bajo upload_lock: un reintento simultáneo ve el job del primero
+    with upload_lock(db, company_name):
+        # Reintentos con el mismo contenido devuelven el job anterior sin reprocesar
+        try:
+            cached = find_cached_job(db, company_name, content_sha256, mode, idempotency_key)
+        except IdempotencyConflict as e:
+            db.rollback()
+            remove_upload(file_path)
+            raise HTTPException(status_code=409, detail=str(e))
+        if cached is not None:
+            db.rollback()
+            remove_upload(file_path)
+            return {"message": "Duplicate upload, returning previous job", "job_id": cached.id, "cached": True}
+
+        # Presupuesto de jobs y bytes en vuelo, global y de la compañía, ahora con el
+        # tamaño real; la reserva del upload se cambia por el job en la misma transacción
+        with admission_lock(db):
+            try:
+                admit(db, company_name, size, reservation_id)
+            except AdmissionRejected as e:
+                db.rollback()
+                remove_upload(file_path)
+                raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+            if reservation_id is not None:
+                release(db, reservation_id)
+            job = Job(
+                company_name=company_name, file_type=file_type, file_path=file_path, mode=mode, state="queued",
+                bytes_received=size, content_sha256=content_sha256, idempotency_key=idempotency_key,
+            )
+            db.add(job)
+            db.commit()
+    logger.info(f"Job {job.id} queued for company: {company_name}")
+    return {"message": "Processing queued", "job_id": job.id, "cached": False}
+
+STATUS_FIELDS = ("id", "status", "field1", "field2", "field3", "extra", "created_at", "file_type")
+
+def _status_query(company_name: str, fields, status=None, created_after=None, created_before=None, after=None):
+    # Consulta por keyset sobre id: cada página continúa donde terminó la anterior
+    query = select(*[getattr(CompanyData, field) for field in fields]).where(CompanyData.company_name == company_name)
+    if status:
+        query = query.where(CompanyData.status == status)
+    else:
+        # Las filas de un lote aún no publicado no son visibles
+        query = query.where(CompanyData.status != "staged")
+    if created_after:
+        query = query.where(CompanyData.created_at >= created_after)
+    if created_before:
+        query = query.where(CompanyData.created_at < created_before)
+    if after is not None:
+        query = query.where(CompanyData.id > after)
+    return query.order_by(CompanyData.id)
+
+def _serialize_row(row):
+    record = dict(row._mapping)
+    if record.get("created_at"):
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+def _parse_fields(fields):
+    if not fields:
+        return STATUS_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in STATUS_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id siempre se incluye porque es el cursor de paginación
+    return tuple(["id"] + [field for field in requested if field != "id"])
+
+async def _stream_ndjson(query):
+    # Sesión propia: la del Depends se cierra antes de terminar el streaming.
+    # yield_per usa un cursor del lado del servidor en PostgreSQL.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=config.STATUS_STREAM_BATCH_SIZE))
+        # Un bloque de salida por lote del cursor en lugar de una escritura por fila
+        async for rows in result.partitions():
+            yield "".join(json.dumps(_serialize_row(row)) + "\n" for row in rows)
 
 @router.get("/status/{company_name}")
-def get_status(company_name: str, db: Session = Depends(get_db)):
+async def get_status(
+    company_name: str,
+    limit: int = Query(None, ge=1),
+    after: int = None,
+    status: str = None,
+    created_after: datetime = None,
+    created_before: datetime = None,
+    fields: str = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    if_none_match: str = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
+):
     logger.info(f"Status endpoint called for company: {company_name}")
-    records = db.query(CompanyData).filter(CompanyData.company_name == company_name).all()
-    if not records:
-        logger.warning(f"No records found for company: {company_name}")
-        raise HTTPException(status_code=404, detail="No records found for this company")
+    columns = _parse_fields(fields)
+    query = _status_query(company_name, columns, status, created_after, created_before, after)
+    if format == "json":
+        limit = min(limit or config.STATUS_PAGE_SIZE, config.STATUS_MAX_PAGE_SIZE)
+
+    # Los datos solo cambian cuando una ingesta confirma: la versión de la
+    # compañía identifica la respuesta sin volver a consultar las filas
+    version = await db.scalar(select(CompanyVersion.version).where(CompanyVersion.company_name == company_name)) or 0
+    key = status_cache.cache_key(company_name, version, format, columns, limit, after, status, created_after, created_before)
+    headers = {"ETag": status_cache.etag(key), "Cache-Control": "no-cache"}
+    not_modified = status_cache.etag_matches(if_none_match, headers["ETag"])
 
+    if format == "ndjson":
+        # Una respuesta NDJSON vacía también es 200: el ETag alcanza
+        if not_modified:
+            status_cache.record_not_modified(key)
+            return Response(status_code=304, headers=headers)
+        if limit:
+            query = query.limit(limit)
+        return StreamingResponse(_stream_ndjson(query), media_type="application/x-ndjson", headers=headers)
+
+    # 304 solo si la respuesta sería un 200: sin datos (compañía desconocida o
+    # filtro sin resultados) es 404 aunque el ETag coincida. La caché solo guarda
+    # respuestas 200, así que un acierto evita la consulta.
+    payload = await status_cache.get(key, record=not not_modified)
+    if payload is None:
+        records = [_serialize_row(row) for row in await db.execute(query.limit(limit))]
+        if not records and after is None:
+            logger.warning(f"No records found for company: {company_name}")
+            raise HTTPException(status_code=404, detail="No records found for this company")
+        payload = json.dumps({
+            "company_name": company_name,
+            "records": records,
+            # Cursor para la siguiente página; None cuando no hay más registros
+            "next_after": records[-1]["id"] if len(records) == limit else None,
+        }, ensure_ascii=False, separators=(",", ":")).encode()
+        await status_cache.put(key, company_name, payload)
+    if not_modified:
+        status_cache.record_not_modified(key)
+        return Response(status_code=304, headers=headers)
+    return Response(payload, media_type="application/json", headers=headers)
+
+@router.get("/status/{company_name}/summary")
+async def get_status_summary(company_name: str, db: AsyncSession = Depends(get_async_db)):
+    # Conteos por estado desde la tabla de resumen: no depende del volumen de datos
+    rows = (await db.execute(
+        select(CompanyStatusSummary.status, CompanyStatusSummary.row_count, CompanyStatusSummary.updated_at)
+        .where(CompanyStatusSummary.company_name == company_name)
+    )).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No records found for this company")
+    statuses = {status: count for status, count, _ in rows if count and status != "staged"}
     return {
         "company_name": company_name,
-        "records": [
-            {
-                "id": record.id,
-                "status": record.status,
-                "field1": record.field1,
-                "field2": record.field2,
-                "field3": record.field3,
-                "created_at": record.created_at.isoformat() if record.created_at else None,
-                "file_type": record.file_type,
-            }
-            for record in records
-        ],
-    }
\ No newline at end of file
+        "statuses": statuses,
+        "total": sum(statuses.values()),
+        "last_updated": max(updated_at for _, _, updated_at in rows).isoformat(),
+    }
+
+@router.get("/cache/status")
+def get_status_cache_stats():
+    return status_cache.cache_stats()
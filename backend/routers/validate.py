@@ -0,0 +1,125 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from lxml import etree
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from backend import config
+from backend.database import get_async_db
+from backend.pipeline import READERS, STREAM_READERS, detect_file_type, validate_batch
+from backend.schemas import DEFAULT_SCHEMA, active_schema_async
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class StreamValidation:
+    # Valida un cuerpo que llega por bloques con las mismas reglas que /process.
+    # La memoria queda acotada por un lote de registros y el registro en curso.
+
+    def __init__(self, file_type: str, schema, max_errors: int):
+        self.file_type = file_type
+        self.schema = schema
+        self.max_errors = max_errors
+        self.reader = STREAM_READERS[file_type]()
+        self.pending = []
+        self.records = 0
+        self.errors = []
+        # Error de sintaxis: no se puede seguir leyendo
+        self.broken = False
+
+    @property
+    def done(self):
+        return self.broken or len(self.errors) >= self.max_errors
+
+    def feed(self, chunk: bytes):
+        self._read(self.reader.feed, chunk)
+
+    def close(self):
+        self._read(self.reader.close)
+        self._check(final=True)
+
+    def _read(self, read, *args):
+        try:
+            self.pending.extend(read(*args))
+        except (ValueError, etree.XMLSyntaxError) as e:
+            # Se informa después de los errores de los registros ya leídos, en la
+            # posición del primer registro que no se pudo leer
+            self._check(final=True)
+            if not self.done:
+                self.errors.append({"record": self.records, "error": str(e)})
+            self.broken = True
+            return
+        self._check()
+
+    def _check(self, final: bool = False):
+        size = config.RECORD_BATCH_SIZE
+        while self.pending and (final or len(self.pending) >= size) and not self.done:
+            items = self.pending[:size]
+            del self.pending[:size]
+            _, errors = validate_batch(items, self.file_type, self.records, self.schema)
+            for index, reason in errors[:self.max_errors - len(self.errors)]:
+                self.errors.append({"record": int(index), "error": reason})
+            self.records += len(items)
+
+
+@router.post("/validate")
+async def validate_data(
+    request: Request,
+    company_name: str = None,
+    max_errors: int = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Chequeo previo de un archivo sin subirlo: el cuerpo se lee como stream y se
+    # deja de leer al llegar a max_errors errores
+    logger.info("Validate endpoint called")
+    content_type = request.headers.get("content-type")
+    file_type = detect_file_type(None, content_type)
+    if file_type not in STREAM_READERS:
+        logger.warning(f"Unsupported content-type: {content_type}")
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported or missing Content-Type. Use application/json, application/x-ndjson, application/xml or text/csv.",
+        )
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > config.VALIDATE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Body exceeds maximum size of {config.VALIDATE_MAX_BYTES} bytes")
+
+    label = READERS[file_type].label
+    # Con company_name se valida contra el esquema vigente de la compañía
+    schema = await active_schema_async(db, company_name) if company_name else DEFAULT_SCHEMA
+    validation = StreamValidation(file_type, schema, max_errors or config.VALIDATE_MAX_ERRORS)
+    received = 0
+    stopped_early = False
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        received += len(chunk)
+        if received > config.VALIDATE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Body exceeds maximum size of {config.VALIDATE_MAX_BYTES} bytes")
+        # Parseo y validación fuera del event loop, un bloque a la vez
+        await run_in_threadpool(validation.feed, chunk)
+        if validation.done:
+            # El resto del cuerpo no se lee
+            stopped_early = True
+            break
+    else:
+        if not received:
+            raise HTTPException(status_code=400, detail=f"{label} body is empty")
+        await run_in_threadpool(validation.close)
+
+    if validation.errors:
+        first = validation.errors[0]
+        logger.error(f"{label} validation failed: {first['error']} (record {first['record']})")
+        return JSONResponse(status_code=400, content={
+            "detail": f"Invalid {label}: {first['error']}",
+            "errors": validation.errors,
+            "records_checked": validation.records,
+            "stopped_early": stopped_early,
+            "schema_version": schema.version,
+        })
+    logger.info(f"{label} validation successful: {validation.records} records")
+    return {"message": f"Valid {label}", "records": validation.records, "bytes": received, "schema_version": schema.version}
@@ -0,0 +1,198 @@
+import json
+from functools import lru_cache
+from typing import Any, List, Literal, NamedTuple, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, Strict, TypeAdapter, ValidationError, model_validator
+from sqlalchemy import func, select
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+from backend import config
+from backend.models.company_schema import CompanySchema
+
+# Columnas fijas de company_data: los campos del esquema que no se asignan a
+# una de ellas se guardan en la columna JSON "extra"
+STORAGE_COLUMNS = {"field1": "str", "field2": "int", "field3": "str"}
+# Valor de las columnas fijas que el esquema no usa (mismo relleno que los vacíos de XML)
+COLUMN_DEFAULTS = {"field1": "N/A", "field2": 0, "field3": "N/A"}
+FIELD_TYPES = {"str": str, "int": int, "float": float, "bool": bool}
+
+
+# Modelo del esquema por defecto (field1/field2/field3); también define el
+# formato de los mensajes de error de la validación por columnas
+class DataModel(BaseModel):
+    field1: str
+    field2: int
+    field3: str
+
+
+class FieldSpec(BaseModel):
+    name: str = Field(pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    type: Literal["str", "int", "float", "bool"] = "str"
+    required: bool = True
+    default: Any = None
+    # strict: el valor debe tener el tipo declarado; si no, se convierte ("12" -> 12).
+    # En XML y CSV todos los valores son texto y siempre se convierten.
+    strict: bool = False
+    # Columna fija donde se guarda; los campos llamados field1/field2/field3 usan la suya
+    column: Optional[Literal["field1", "field2", "field3"]] = None
+
+
+class SchemaSpec(BaseModel):
+    fields: List[FieldSpec] = Field(min_length=1)
+    # Campos no declarados en los registros: allow los guarda en extra
+    extra: Literal["allow", "ignore", "forbid"] = "allow"
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        names = [spec.name for spec in self.fields]
+        if len(set(names)) != len(names):
+            raise ValueError("Field names must be unique")
+        columns = {}
+        for spec in self.fields:
+            column = _column_of(spec)
+            if column is None:
+                continue
+            if column in columns:
+                raise ValueError(f"Column {column} is used by {columns[column]} and {spec.name}")
+            if STORAGE_COLUMNS[column] != spec.type:
+                raise ValueError(f"Field {spec.name} must be of type {STORAGE_COLUMNS[column]} to be stored in {column}")
+            columns[column] = spec.name
+            if not spec.required and spec.default is None:
+                raise ValueError(f"Field {spec.name} is stored in {column} and needs a default when it is optional")
+        for spec in self.fields:
+            if spec.default is not None:
+                try:
+                    TypeAdapter(FIELD_TYPES[spec.type]).validate_python(spec.default)
+                except ValidationError:
+                    raise ValueError(f"Default of {spec.name} is not a valid {spec.type}")
+        return self
+
+
+def _column_of(spec: FieldSpec):
+    if spec.column is not None:
+        return spec.column
+    return spec.name if spec.name in STORAGE_COLUMNS else None
+
+
+class SchemaVersion(NamedTuple):
+    # Referencia liviana y serializable a una versión del esquema; se envía a los
+    # procesos de parseo y cada uno compila el validador una sola vez (compile_schema)
+    company_name: Optional[str]
+    version: int
+    definition: str
+
+    @property
+    def is_default(self):
+        return self.version == 0
+
+
+DEFAULT_DEFINITION = {"fields": [{"name": name, "type": kind} for name, kind in STORAGE_COLUMNS.items()], "extra": "ignore"}
+DEFAULT_SCHEMA = SchemaVersion(None, 0, json.dumps(DEFAULT_DEFINITION))
+
+
+class CompiledSchema:
+    # Validador y transformador de una versión del esquema: un TypeAdapter sobre
+    # la lista de registros (validación en pydantic-core, sin instancias por fila)
+    # y la asignación de cada campo a su columna fija o a extra
+
+    def __init__(self, schema: SchemaVersion, typed: bool):
+        spec = SchemaSpec.model_validate_json(schema.definition)
+        self.schema = schema
+        self.typed = typed
+        self.defaults = {field.name: field.default for field in spec.fields if field.default is not None}
+        self.columns = {column: None for column in STORAGE_COLUMNS}
+        fields = {}
+        for field in spec.fields:
+            kind = FIELD_TYPES[field.type]
+            if field.strict and typed:
+                kind = Annotated[kind, Strict()]
+            if not field.required and field.name not in self.defaults:
+                kind = NotRequired[Optional[kind]]
+            fields[field.name] = kind
+            column = _column_of(field)
+            if column is not None:
+                self.columns[column] = field.name
+        record = TypedDict(f"Schema_{schema.company_name}_{schema.version}", fields)
+        record.__pydantic_config__ = ConfigDict(extra=spec.extra)
+        self.adapter = TypeAdapter(List[record])
+        self.stored = set(name for name in self.columns.values() if name is not None)
+        # Columnas que necesita leer un formato columnar (None: todas)
+        self.projection = None if spec.extra == "allow" else tuple(fields)
+
+    def _prepare(self, item):
+        if not isinstance(item, dict):
+            return item
+        if not self.typed:
+            # XML/CSV: una celda o elemento vacío cuenta como ausente
+            item = {key: value for key, value in item.items() if value is not None}
+        return {**self.defaults, **item} if self.defaults else item
+
+    def validate(self, items, offset: int = 0):
+        # Devuelve las columnas normalizadas (field1..3 y extra) y la lista
+        # ordenada de (posición del registro, motivo) de los registros inválidos
+        try:
+            records = self.adapter.validate_python([self._prepare(item) for item in items])
+        except ValidationError as e:
+            errors = {}
+            for error in e.errors():
+                index, *field = error["loc"]
+                reason = f"{'.'.join(str(part) for part in field)}: {error['msg']}" if field else error["msg"]
+                errors.setdefault(index, reason)
+            return None, [(offset + index, errors[index]) for index in sorted(errors)]
+
+        columns = {}
+        for column, name in self.columns.items():
+            if name is None:
+                columns[column] = [COLUMN_DEFAULTS[column]] * len(records)
+            else:
+                columns[column] = [record[name] for record in records]
+        stored = self.stored
+        columns["extra"] = [
+            {key: value for key, value in record.items() if key not in stored} or None for record in records
+        ]
+        return columns, []
+
+
+@lru_cache(maxsize=config.SCHEMA_CACHE_SIZE)
+def compile_schema(schema: SchemaVersion, typed: bool):
+    # Una compilación por versión del esquema y proceso: los uploads siguientes la reutilizan
+    return CompiledSchema(schema, typed)
+
+
+def _latest(company_name: str, version: int = None):
+    query = select(CompanySchema).where(CompanySchema.company_name == company_name)
+    if version is not None:
+        return query.where(CompanySchema.version == version)
+    return query.order_by(CompanySchema.version.desc()).limit(1)
+
+
+def _schema_version(row):
+    if row is None:
+        return None
+    return SchemaVersion(row.company_name, row.version, json.dumps(row.definition, sort_keys=True))
+
+
+def active_schema(db, company_name: str):
+    # Última versión registrada de la compañía o el esquema por defecto
+    return _schema_version(db.scalar(_latest(company_name))) or DEFAULT_SCHEMA
+
+
+async def active_schema_async(db, company_name: str):
+    return _schema_version(await db.scalar(_latest(company_name))) or DEFAULT_SCHEMA
+
+
+async def get_schema(db, company_name: str, version: int = None):
+    return await db.scalar(_latest(company_name, version))
+
+
+def register_schema(db, company_name: str, spec: SchemaSpec):
+    # Cada registro crea una versión nueva; las anteriores se conservan.
+    # Dos registros simultáneos chocan en la restricción única (company_name, version).
+    current = db.scalar(select(func.max(CompanySchema.version)).where(CompanySchema.company_name == company_name)) or 0
+    definition = spec.model_dump(mode="json")
+    # Falla aquí, y no en el primer upload, si la definición no compila
+    compile_schema(SchemaVersion(company_name, current + 1, json.dumps(definition, sort_keys=True)), True)
+    row = CompanySchema(company_name=company_name, version=current + 1, definition=definition)
+    db.add(row)
+    db.commit()
+    return row
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    # LRU en proceso con límites de entradas, de bytes y TTL. Sin invalidación
+    # explícita (la ingesta corre en el worker, otro proceso): la versión de la
+    # compañía forma parte de la clave y las entradas viejas salen por LRU o TTL.
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        _, _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key: str, company_name: str, payload: bytes):
+        if len(payload) > config.STATUS_CACHE_MAX_BYTES:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + config.STATUS_CACHE_TTL_SECONDS, company_name, payload)
+            self._bytes += len(payload)
+            while len(self._entries) > config.STATUS_CACHE_MAX_ENTRIES or self._bytes > config.STATUS_CACHE_MAX_BYTES:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self):
+        with self._lock:
+            return len(self._entries), self._bytes
+
+
+class RedisBackend:
+    # Backend compartido entre procesos e instancias del API (requiere el paquete redis).
+    # No necesita invalidación explícita: la versión de la compañía forma parte
+    # de la clave, así que las entradas viejas dejan de usarse y expiran por TTL.
+
+    def __init__(self, url: str):
+        from redis import asyncio as redis
+
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str):
+        return await self._client.get(key)
+
+    async def set(self, key: str, company_name: str, payload: bytes):
+        await self._client.set(key, payload, ex=config.STATUS_CACHE_TTL_SECONDS)
+
+
+_local = MemoryBackend()
+_shared = RedisBackend(config.STATUS_CACHE_URL) if config.STATUS_CACHE_URL else None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "bytes_saved": 0}
+
+
+def set_shared_backend(backend):
+    # Cualquier objeto con métodos async get(key) y set(key, company_name, payload)
+    global _shared
+    _shared = backend
+
+
+def _record(name: str, saved: int = 0):
+    with _lock:
+        _stats[name] += 1
+        _stats["bytes_saved"] += saved
+
+
+def cache_key(company_name: str, version: int, *params):
+    digest = hashlib.blake2b(json.dumps(params, default=str).encode(), digest_size=8).hexdigest()
+    return f"status:{version}:{digest}:{company_name}"
+
+
+def etag(key: str):
+    # status:{version}:{digest}:{company}: la compañía ya va en la URL
+    _, version, digest, _ = key.split(":", 3)
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str, current: str):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or current in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+async def get(key: str, record: bool = True):
+    # record=False: consulta de un request condicional, que se cuenta como not_modified
+    if config.STATUS_CACHE_TTL_SECONDS <= 0:
+        return None
+    payload = _local.get(key)
+    if payload is None and _shared is not None:
+        try:
+            payload = await _shared.get(key)
+        except Exception as e:
+            logger.warning(f"Shared status cache unavailable: {e}")
+        if payload is not None:
+            _local.set(key, key.split(":", 3)[3], payload)
+    if not record:
+        return payload
+    if payload is None:
+        _record("misses")
+    else:
+        _record("hits", len(payload))
+    return payload
+
+
+async def put(key: str, company_name: str, payload: bytes):
+    if config.STATUS_CACHE_TTL_SECONDS <= 0:
+        return
+    _local.set(key, company_name, payload)
+    if _shared is not None:
+        try:
+            await _shared.set(key, company_name, payload)
+        except Exception as e:
+            logger.warning(f"Shared status cache unavailable: {e}")
+
+
+def record_not_modified(key: str):
+    # El cuerpo no se envía: se ahorra su tamaño si se conoce
+    payload = _local.get(key)
+    _record("not_modified", len(payload) if payload is not None else 0)
+
+
+def cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    entries, size = _local.size()
+    return {
+        **stats,
+        "hit_ratio": stats["hits"] / lookups if lookups else 0.0,
+        "entries": entries,
+        "bytes": size,
+        "ttl_seconds": config.STATUS_CACHE_TTL_SECONDS,
+        "shared_backend": type(_shared).__name__ if _shared is not None else None,
+    }
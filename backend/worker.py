@@ -0,0 +1,189 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from backend import config, metrics
+from backend.database import SessionLocal, engine
+from backend.logging_setup import configure_logging
+from backend.models.job import Job
+from backend.archives import BATCH_TYPES
+from backend.routers.upload import process_files_in_background, process_in_background, remove_upload
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_stale_jobs(db):
+    # Jobs cuyo worker murió a mitad de proceso (lease vencido) vuelven a la cola.
+    # Un job largo pero vivo renueva heartbeat_at y no se toca.
+    limit = datetime.utcnow() - timedelta(seconds=config.JOB_STALE_SECONDS)
+    result = db.execute(
+        update(Job)
+        .where(Job.state == "running", func.coalesce(Job.heartbeat_at, Job.started_at) < limit)
+        .values(state="queued", worker=None, started_at=None, heartbeat_at=None)
+    )
+    db.commit()
+    if result.rowcount:
+        logger.warning(f"Requeued {result.rowcount} stale jobs")
+
+
+def claim_next_job(db, worker_id: str = WORKER_ID):
+    # Reparto justo entre compañías: primero los jobs de la compañía con menos jobs
+    # en proceso y, entre ellos, el más antiguo. Una compañía con muchos uploads
+    # encolados no retrasa a las demás más allá de un job por worker libre.
+    # FOR UPDATE SKIP LOCKED en PostgreSQL; en SQLite se ignora y el UPDATE
+    # condicionado a state='queued' garantiza que solo un worker gana el job
+    running = aliased(Job)
+    running_count = (
+        select(func.count())
+        .where(running.company_name == Job.company_name, running.state == "running")
+        .correlate(Job)
+        .scalar_subquery()
+    )
+    query = select(Job.id).where(Job.state == "queued")
+    if config.WORKER_COMPANY_MAX_RUNNING > 0:
+        query = query.where(running_count < config.WORKER_COMPANY_MAX_RUNNING)
+    job_id = db.execute(
+        query
+        .order_by(running_count, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True, of=Job)
+    ).scalar()
+    if job_id is None:
+        db.rollback()
+        return None
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.state == "queued")
+        .values(state="running", worker=worker_id, started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+    )
+    db.commit()
+    return job_id if result.rowcount == 1 else None
+
+
+def _owned(job_id: int, worker_id: str):
+    # Condición del lease: el job sigue en proceso y asignado a este worker
+    return Job.id == job_id, Job.worker == worker_id, Job.state == "running"
+
+
+def _heartbeat(job_id: int, worker_id: str, stop: threading.Event):
+    # Renueva el lease en una sesión propia mientras el job se procesa
+    while not stop.wait(config.JOB_HEARTBEAT_SECONDS):
+        db = SessionLocal()
+        try:
+            renewed = db.execute(update(Job).where(*_owned(job_id, worker_id)).values(heartbeat_at=datetime.utcnow())).rowcount
+            db.commit()
+        except Exception as e:
+            # Base ocupada o caída: se reintenta en el siguiente intervalo
+            logger.warning(f"Heartbeat failed for job {job_id}: {e}")
+            continue
+        finally:
+            db.close()
+        if not renewed:
+            logger.warning(f"Job {job_id} is no longer owned by worker {worker_id}")
+            return
+
+
+def run_job(job_id: int, worker_id: str = WORKER_ID):
+    db = SessionLocal()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, worker_id, stop), daemon=True)
+    try:
+        job = db.get(Job, job_id)
+        logger.info(f"Running job {job_id} for company: {job.company_name}")
+        heartbeat.start()
+        try:
+            # Tiempos, filas y bytes de cada etapa del job (ver backend/metrics.py)
+            with metrics.job_stages():
+                if job.file_type in BATCH_TYPES:
+                    stats = process_files_in_background(job.company_name, job.file_path, job.file_type, batch_id=job.id, mode=job.mode)
+                else:
+                    # Los lotes cuentan los bytes validados por archivo (ver iter_parsed_members)
+                    metrics.add("validate", size=job.bytes_received or 0)
+                    with open(job.file_path, "rb") as file_obj:
+                        stats = process_in_background(job.company_name, file_obj, job.file_type, batch_id=job.id, mode=job.mode)
+            result = {
+                "state": "superseded" if stats["superseded"] else "completed",
+                "records_loaded": 0 if stats["superseded"] else stats["inserted"],
+                "records_skipped": stats["rows"] if stats["superseded"] else stats["skipped"],
+                # Archivos inválidos dentro de un lote de varios archivos
+                "error": stats.get("error"),
+                "schema_version": stats.get("schema_version"),
+            }
+        except Exception as e:
+            result = {"state": "failed", "error": str(e)}
+        finally:
+            stop.set()
+            heartbeat.join()
+        # Solo el dueño del lease cierra el job: si se volvió a encolar, el
+        # resultado y el archivo pertenecen al worker que lo tomó después
+        finished = db.execute(
+            update(Job).where(*_owned(job_id, worker_id)).values(**result, finished_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if not finished:
+            logger.warning(f"Job {job_id} lease was lost, discarding result: {result['state']}")
+            return None
+        metrics.JOBS_FINISHED.labels(result["state"]).inc()
+        logger.info(f"Job {job_id} finished with state: {result['state']}")
+        remove_upload(job.file_path)
+        return result["state"]
+    finally:
+        db.close()
+
+
+def run_pending_jobs(limit: int = None):
+    # Procesa en este mismo proceso los jobs en cola (scripts y pruebas)
+    processed = 0
+    db = SessionLocal()
+    try:
+        while limit is None or processed < limit:
+            job_id = claim_next_job(db)
+            if job_id is None:
+                break
+            run_job(job_id)
+            processed += 1
+    finally:
+        db.close()
+    return processed
+
+
+def _init_process():
+    # Los procesos hijos no deben reutilizar conexiones heredadas del padre
+    engine.dispose(close=False)
+    # ni la cola de logs, cuyo hilo escritor no existe en el hijo
+    configure_logging()
+
+
+def run_worker(processes: int = None, poll_interval: float = None):
+    processes = processes or config.WORKER_PROCESSES
+    poll_interval = poll_interval or config.WORKER_POLL_INTERVAL
+    logger.info(f"Worker {WORKER_ID} started with {processes} processes")
+    db = SessionLocal()
+    running = set()
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_process) as pool:
+            while True:
+                requeue_stale_jobs(db)
+                running = {future for future in running if not future.done()}
+                while len(running) < processes:
+                    job_id = claim_next_job(db)
+                    if job_id is None:
+                        break
+                    running.add(pool.submit(run_job, job_id, WORKER_ID))
+                time.sleep(poll_interval)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    run_worker()
@@ -0,0 +1,75 @@
+"""Compara el throughput de /export (CSV, NDJSON, Parquet) con paginar /status.
+
+Uso: python -m benchmarks.bench_export --rows 1000000
+Usa la base configurada en backend.database.
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from backend.database import SessionLocal
+from backend.loader import bulk_load
+from backend.main import app
+from backend.models.company_data import CompanyData
+from backend.routers import export
+
+
+def measure(name, func, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "case": name, "rows": rows, "seconds": round(elapsed, 3), "bytes": size, "peak_bytes": peak,
+        "mb_per_sec": round(size / 2**20 / elapsed, 1), "rows_per_sec": round(rows / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--company", default="bench_export")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    db.execute(delete(CompanyData).where(CompanyData.company_name == args.company))
+    records = ({"field1": f"value{i}", "field2": i, "field3": "data"} for i in range(args.rows))
+    bulk_load(records, db, args.company, status="processed", file_type="json")
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+
+    def status_pages():
+        size, after = 0, None
+        while True:
+            params = {"limit": 10000, **({"after": after} if after is not None else {})}
+            response = client.get(f"/status/{args.company}", params=params)
+            size += len(response.content)
+            after = response.json()["next_after"]
+            if after is None:
+                return size
+
+    def export_stream(format):
+        # Se consume el generador del endpoint: el TestClient acumularía el cuerpo completo
+        async def consume():
+            stream = export._stream_export(export._export_query(args.company), export.ENCODERS[format]())
+            return sum([len(chunk) async for chunk in stream])
+        return lambda: asyncio.run(consume())
+
+    cases = [("status_pages", status_pages)] + [(f"export_{format}", export_stream(format)) for format in ("csv", "ndjson", "parquet")]
+    for name, func in cases:
+        if name == "export_parquet" and export.pa is None:
+            continue
+        print(json.dumps(measure(name, func, args.rows)))
+
+
+if __name__ == "__main__":
+    main()
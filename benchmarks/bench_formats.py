@@ -0,0 +1,81 @@
+"""Mide tamaño de archivo y registros/seg de parseo + validación para cada formato de entrada.
+
+Uso: python -m benchmarks.bench_formats --records 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from backend import config
+from backend.pipeline import READERS, iter_batches
+
+
+def write_file(path, n, file_type):
+    rows = ((f"value{i}", i, "data") for i in range(n))
+    if file_type == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        size = 100000
+        with pq.ParquetWriter(path, pa.schema([("field1", pa.string()), ("field2", pa.int64()), ("field3", pa.string())])) as writer:
+            for start in range(0, n, size):
+                count = min(size, n - start)
+                writer.write_table(pa.table({
+                    "field1": [f"value{i}" for i in range(start, start + count)],
+                    "field2": list(range(start, start + count)),
+                    "field3": ["data"] * count,
+                }))
+        return
+    with open(path, "w") as f:
+        if file_type == "json":
+            f.write("[")
+            f.write(",\n".join(f'{{"field1": "{a}", "field2": {b}, "field3": "{c}"}}' for a, b, c in rows))
+            f.write("]")
+        elif file_type == "ndjson":
+            f.writelines(f'{{"field1": "{a}", "field2": {b}, "field3": "{c}"}}\n' for a, b, c in rows)
+        elif file_type == "csv":
+            f.write("field1,field2,field3\n")
+            f.writelines(f"{a},{b},{c}\n" for a, b, c in rows)
+        else:
+            f.write("<root>")
+            f.writelines(f"<record><field1>{a}</field1><field2>{b}</field2><field3>{c}</field3></record>" for a, b, c in rows)
+            f.write("</root>")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", default=sorted(READERS))
+    parser.add_argument("--memory", action="store_true", help="Mide el pico de memoria (más lento)")
+    args = parser.parse_args()
+
+    # Camino secuencial: compara los lectores, no el reparto entre procesos
+    config.PARSE_WORKERS = 1
+    for file_type in args.formats:
+        with tempfile.NamedTemporaryFile(suffix=f".{file_type}", delete=False) as tmp:
+            path = tmp.name
+        try:
+            write_file(path, args.records, file_type)
+            if args.memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            with open(path, "rb") as file_obj:
+                rows = sum(len(batch["field1"]) for batch in iter_batches(file_obj, file_type))
+            elapsed = time.perf_counter() - start
+            result = {
+                "file_type": file_type, "records": rows, "megabytes": round(os.path.getsize(path) / 2**20, 1),
+                "seconds": round(elapsed, 3), "records_per_sec": round(rows / elapsed),
+            }
+            if args.memory:
+                result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print(json.dumps(result))
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Benchmark de punta a punta de la ingesta con datos sintéticos: mide cada etapa por separado.
+
+Uso:
+  python -m benchmarks.bench_ingest --records 1000 100000 1000000 --duplicates 0.1 --output bench.json
+  python -m benchmarks.bench_ingest --check benchmarks/thresholds.json --baseline bench_main.json
+
+Etapas (cada una en un proceso nuevo, así el pico de memoria es solo de esa etapa):
+  validate  /validate: parseo incremental y validación del stream, contando todos los errores
+  parse     validate_content/transform_data: parseo, validación, normalización y deduplicación
+  load      load_data_to_db: bulk_load de filas ya normalizadas en una transacción que se descarta
+  ingest    process_in_background completo: lote staged, carga y publicación
+
+Usa una base SQLite temporal salvo que se indique --database-url (p. ej. un PostgreSQL local).
+Imprime un resultado JSON por línea y sale con código 1 si algún resultado no cumple
+los umbrales (--check) o empeora más de --tolerance respecto de un resultado anterior (--baseline).
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks.datagen import FORMATS, generate
+
+STAGES = ("validate", "parse", "load", "ingest")
+COMPANY = "bench_ingest"
+# Clave de un resultado para compararlo con el baseline
+RESULT_KEY = ("stage", "format", "records", "duplicate_ratio", "invalid_ratio")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB y macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _prepare_database():
+    from backend.database import Base, engine
+    from backend.models import company_data, company_schema, company_status_summary, company_version, job, job_file, upload_reservation  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return engine.dialect.name
+
+
+def _validate(path, file_type, records):
+    from backend import config
+    from backend.pipeline import STREAM_READERS
+    from backend.routers.validate import StreamValidation
+    from backend.schemas import DEFAULT_SCHEMA
+
+    if file_type not in STREAM_READERS:
+        return None
+    validation = StreamValidation(file_type, DEFAULT_SCHEMA, sys.maxsize)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                validation.close()
+                break
+            validation.feed(chunk)
+            if validation.done:
+                break
+    return {"rows_out": validation.records, "errors": len(validation.errors)}
+
+
+def _parse(path, file_type, records):
+    from backend.pipeline import iter_batches
+
+    rows = 0
+    try:
+        with open(path, "rb") as f:
+            for batch in iter_batches(f, file_type):
+                rows += len(batch["row_hash"])
+    except ValueError as e:
+        return {"rows_out": rows, "error": str(e)[:200]}
+    return {"rows_out": rows}
+
+
+def _load(path, file_type, records):
+    from backend.database import SessionLocal
+    from backend.loader import bulk_load
+    from benchmarks.datagen import iter_rows
+
+    db = SessionLocal()
+    try:
+        rows = ({"field1": a, "field2": b, "field3": c} for a, b, c in iter_rows(records))
+        stats = bulk_load(rows, db, COMPANY, status="staged", file_type="bench", batch_id=0)
+    finally:
+        db.rollback()
+        db.close()
+    return {"rows_out": stats["inserted"]}
+
+
+def _ingest(path, file_type, records):
+    from backend.database import SessionLocal
+    from backend.loader import _delete_rows
+    from backend.models.company_data import CompanyData
+    from backend.models.job import Job
+    from backend.routers.upload import process_in_background
+
+    db = SessionLocal()
+    job = Job(company_name=COMPANY, file_type=file_type, file_path=path, mode="replace", state="running")
+    db.add(job)
+    db.commit()
+    try:
+        stats = process_in_background(COMPANY, open(path, "rb"), file_type, batch_id=job.id)
+        return {"rows_out": stats["inserted"]}
+    except ValueError as e:
+        return {"error": str(e)[:200]}
+    finally:
+        _delete_rows(db, COMPANY, CompanyData.company_name == COMPANY)
+        db.delete(job)
+        db.commit()
+        db.close()
+
+
+STAGE_FUNCTIONS = {"validate": _validate, "parse": _parse, "load": _load, "ingest": _ingest}
+
+
+def _run_stage(stage, path, file_type, records):
+    # Se ejecuta en un proceso nuevo; el tiempo no incluye importar el backend
+    import logging
+
+    logging.disable(logging.INFO)
+    _prepare_database()
+    # Los imports del backend (numpy, pandas, lxml...) quedan fuera de la medición
+    import backend.parallel, backend.routers.upload, backend.routers.validate  # noqa: E401, F401
+    base = _peak_rss_mb()
+    start = time.perf_counter()
+    result = STAGE_FUNCTIONS[stage](path, file_type, records)
+    elapsed = time.perf_counter() - start
+    if result is None:
+        return None
+    peak = _peak_rss_mb()
+    return {
+        **result,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(records / elapsed) if elapsed > 0 else None,
+        "peak_rss_mb": round(peak, 1),
+        # Crecimiento de memoria atribuible a la etapa (sin el intérprete y los imports)
+        "stage_rss_mb": round(peak - base, 1),
+    }
+
+
+def _in_child(function, *args):
+    # Proceso nuevo (spawn): no hereda memoria ni conexiones del proceso principal
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(function, *args).result()
+
+
+def run_stage(stage, path, file_type, records):
+    return _in_child(_run_stage, stage, path, file_type, records)
+
+
+def environment(database: str):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": database,
+        "parse_workers": os.environ.get("PARSE_WORKERS"),
+    }
+
+
+def _thresholds_for(thresholds, result):
+    stages = thresholds.get("stages", {})
+    return {**stages.get(result["stage"], {}), **stages.get(f"{result['stage']}.{result['format']}", {})}
+
+
+def check(results, thresholds=None, baseline=None, tolerance: float = None):
+    # Lista de incumplimientos. Los umbrales de velocidad solo aplican desde
+    # thresholds["min_records"] registros (con menos domina el arranque) y ninguno
+    # aplica a corridas con filas inválidas, que se detienen en el primer error.
+    thresholds = thresholds or {}
+    tolerance = tolerance if tolerance is not None else thresholds.get("tolerance", 0.2)
+    previous = {tuple(r[k] for k in RESULT_KEY): r for r in (baseline or {}).get("results", [])}
+    failures = []
+    for result in results:
+        name = f"{result['stage']}/{result['format']}/{result['records']}"
+        if result.get("invalid_ratio") or "error" in result:
+            continue
+        limits = _thresholds_for(thresholds, result)
+        if result["records"] >= thresholds.get("min_records", 0) and result["rows_per_sec"] < limits.get("min_rows_per_sec", 0):
+            failures.append(f"{name}: {result['rows_per_sec']} rows/sec < {limits['min_rows_per_sec']}")
+        if "max_stage_rss_mb" in limits and result["stage_rss_mb"] > limits["max_stage_rss_mb"]:
+            failures.append(f"{name}: stage memory {result['stage_rss_mb']} MB > {limits['max_stage_rss_mb']} MB")
+        before = previous.get(tuple(result[k] for k in RESULT_KEY))
+        if before is None:
+            continue
+        if result["records"] >= thresholds.get("min_records", 0) and result["rows_per_sec"] < before["rows_per_sec"] * (1 - tolerance):
+            failures.append(f"{name}: {result['rows_per_sec']} rows/sec, baseline {before['rows_per_sec']} (-{tolerance:.0%} allowed)")
+        # Margen fijo de 16 MB: con pocos datos el crecimiento de memoria es ruido
+        if result["stage_rss_mb"] > before["stage_rss_mb"] * (1 + tolerance) + 16:
+            failures.append(f"{name}: stage memory {result['stage_rss_mb']} MB, baseline {before['stage_rss_mb']} MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--formats", nargs="+", choices=FORMATS)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Proporción de filas repetidas")
+    parser.add_argument("--invalid", type=float, default=0.0, help="Proporción de filas inválidas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="PARSE_WORKERS de las etapas")
+    parser.add_argument("--database-url", help="Base para load/ingest (por defecto SQLite temporal)")
+    parser.add_argument("--output", help="Archivo JSON con el entorno, los resultados y los incumplimientos")
+    parser.add_argument("--check", help="Archivo de umbrales, p. ej. benchmarks/thresholds.json")
+    parser.add_argument("--baseline", help="Resultado anterior (--output) con el que comparar")
+    parser.add_argument("--tolerance", type=float, help="Empeoramiento admitido respecto del baseline")
+    args = parser.parse_args()
+
+    formats = args.formats or [f for f in FORMATS if f != "parquet" or importlib.util.find_spec("pyarrow")]
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    # Los procesos de cada etapa heredan la configuración por variables de entorno
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["PARSE_WORKERS"] = str(args.workers)
+    os.environ["UPLOAD_CACHE_TTL_SECONDS"] = "0"
+    database = _in_child(_prepare_database)
+
+    results = []
+    try:
+        for records in args.records:
+            if "load" in args.stages:
+                # La carga no depende del formato de entrada
+                results.append({"stage": "load", "format": "-", "records": records, "duplicate_ratio": 0.0, "invalid_ratio": 0.0,
+                                **run_stage("load", None, None, records)})
+                print(json.dumps(results[-1]), flush=True)
+            for file_type in formats:
+                path = os.path.join(workdir, f"data.{file_type}")
+                counts = generate(path, file_type, records, args.duplicates, args.invalid, args.seed)
+                info = {
+                    "format": file_type, "records": records, "duplicate_ratio": args.duplicates, "invalid_ratio": args.invalid,
+                    "duplicates": counts["duplicates"], "invalid": counts["invalid"], "file_mb": round(os.path.getsize(path) / 2**20, 2),
+                }
+                for stage in args.stages:
+                    if stage == "load":
+                        continue
+                    result = run_stage(stage, path, file_type, records)
+                    if result is not None:
+                        results.append({"stage": stage, **info, **result})
+                        print(json.dumps(results[-1]), flush=True)
+                os.unlink(path)
+    finally:
+        if not args.database_url:
+            for name in os.listdir(workdir):
+                os.unlink(os.path.join(workdir, name))
+            os.rmdir(workdir)
+
+    thresholds = None
+    if args.check:
+        with open(args.check) as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(results, thresholds, baseline, args.tolerance)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(database), "results": results, "failures": failures}, f, indent=2)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
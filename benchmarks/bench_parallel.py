@@ -0,0 +1,58 @@
+"""Mide registros/seg del parseo + transformación con distinto número de procesos.
+
+Uso: python -m benchmarks.bench_parallel --records 2000000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from backend import config
+from backend.pipeline import iter_batches
+
+
+def write_file(path, n, file_type):
+    with open(path, "w") as f:
+        if file_type == "json":
+            f.write("[")
+            f.write(",\n".join(f'{{"field1": "value{i}", "field2": {i}, "field3": "data"}}' for i in range(n)))
+            f.write("]")
+        elif file_type == "ndjson":
+            f.writelines(f'{{"field1": "value{i}", "field2": {i}, "field3": "data"}}\n' for i in range(n))
+        else:
+            f.write("<root>")
+            f.writelines(f"<record><field1>value{i}</field1><field2>{i}</field2><field3>data</field3></record>" for i in range(n))
+            f.write("</root>")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=2000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    # Todo archivo del benchmark usa el camino paralelo cuando workers > 1
+    config.PARALLEL_MIN_BYTES = 0
+    for file_type in ("json", "ndjson", "xml"):
+        with tempfile.NamedTemporaryFile(suffix=f".{file_type}", delete=False) as tmp:
+            path = tmp.name
+        try:
+            write_file(path, args.records, file_type)
+            size = os.path.getsize(path)
+            for workers in args.workers:
+                config.PARSE_WORKERS = workers
+                start = time.perf_counter()
+                with open(path, "rb") as file_obj:
+                    rows = sum(len(batch["field1"]) for batch in iter_batches(file_obj, file_type))
+                elapsed = time.perf_counter() - start
+                print(json.dumps({
+                    "file_type": file_type, "workers": workers, "records": rows, "megabytes": round(size / 2**20, 1),
+                    "seconds": round(elapsed, 3), "records_per_sec": round(rows / elapsed),
+                }))
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
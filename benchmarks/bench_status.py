@@ -0,0 +1,89 @@
+"""Compara latencia y memoria de /status: versión anterior (.all()), página por keyset y NDJSON.
+
+Uso: python -m benchmarks.bench_status --rows 200000
+Usa la base configurada en backend.database.
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from backend.database import SessionLocal
+from backend.loader import bulk_load
+from backend.main import app
+from backend.models.company_data import CompanyData
+from backend.routers import upload
+
+
+def legacy_status(company_name):
+    # Implementación original: todas las filas ORM en memoria y una sola lista JSON
+    db = SessionLocal()
+    try:
+        records = db.query(CompanyData).filter(CompanyData.company_name == company_name).all()
+        return json.dumps({
+            "company_name": company_name,
+            "records": [
+                {
+                    "id": r.id, "status": r.status, "field1": r.field1, "field2": r.field2, "field3": r.field3,
+                    "created_at": r.created_at.isoformat() if r.created_at else None, "file_type": r.file_type,
+                }
+                for r in records
+            ],
+        })
+    finally:
+        db.close()
+
+
+def measure(name, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"case": name, "seconds": round(elapsed, 4), "peak_bytes": peak, "response_bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--company", default="bench_status")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    db.execute(delete(CompanyData).where(CompanyData.company_name == args.company))
+    records = ({"field1": f"value{i}", "field2": i, "field3": "data"} for i in range(args.rows))
+    bulk_load(records, db, args.company, status="processed", file_type="json")
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+
+    def first_page():
+        return len(client.get(f"/status/{args.company}").content)
+
+    def stream_ndjson():
+        # Se consume el generador del endpoint directamente: el TestClient
+        # acumula el cuerpo completo y ocultaría la memoria del servidor
+        query = upload._status_query(args.company, upload.STATUS_FIELDS)
+
+        async def consume():
+            return sum([len(chunk) async for chunk in upload._stream_ndjson(query)])
+        return asyncio.run(consume())
+
+    results = [
+        measure("legacy_all", lambda: len(legacy_status(args.company))),
+        measure("paginated_first_page", first_page),
+        measure("ndjson_stream", stream_ndjson),
+    ]
+    for result in results:
+        result["rows"] = args.rows
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Compara registros/seg del validador anterior (DataModel por registro) con el validador por columnas.
+
+Uso: python -m benchmarks.bench_validators --sizes 100000 1000000
+"""
+import argparse
+import json
+import time
+
+from backend import config
+from backend.pipeline import REQUIRED_FIELDS, DataModel, validate_batch
+
+
+def legacy_validate(items, file_type):
+    # Lógica de validación anterior, registro por registro
+    for item in items:
+        if file_type == "json":
+            DataModel(**item)
+        else:
+            if any(field not in item for field in REQUIRED_FIELDS):
+                raise ValueError("Missing required fields: field1, field2, or field3")
+            field2 = int(item["field2"]) if item["field2"] else 0
+            DataModel(field1=item["field1"] or "N/A", field2=field2, field3=item["field3"] or "N/A")
+
+
+def columnar_validate(items, file_type):
+    size = config.RECORD_BATCH_SIZE
+    for start in range(0, len(items), size):
+        _, errors = validate_batch(items[start:start + size], file_type, start)
+        if errors:
+            raise ValueError(errors[0])
+
+
+def make_items(n, file_type):
+    if file_type == "json":
+        return [{"field1": f"value{i}", "field2": i, "field3": "data"} for i in range(n)]
+    # En XML todos los valores llegan como texto
+    return [{"field1": f"value{i}", "field2": str(i), "field3": None if i % 10 == 0 else "data"} for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        for file_type in ("json", "xml"):
+            items = make_items(n, file_type)
+            for name, validator in (("pydantic_per_record", legacy_validate), ("columnar", columnar_validate)):
+                start = time.perf_counter()
+                validator(items, file_type)
+                elapsed = time.perf_counter() - start
+                print(json.dumps({
+                    "validator": name, "file_type": file_type, "records": n,
+                    "seconds": round(elapsed, 4), "records_per_sec": round(n / elapsed),
+                }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Genera archivos sintéticos de cualquier formato soportado para benchmarks y pruebas de carga.
+
+Uso: python -m benchmarks.datagen --format json --records 10000000 --duplicates 0.1 --invalid 0.001 data.json
+Los archivos se escriben en streaming: la memoria no depende de --records.
+"""
+import argparse
+import json
+import random
+from collections import deque
+from itertools import islice
+
+FORMATS = ("json", "ndjson", "xml", "csv", "parquet")
+INVALID_FIELD2 = "not-a-number"
+RECENT = 100000
+
+
+def row(i: int):
+    return f"value{i}", i, f"data{i % 1000}"
+
+
+def iter_rows(records: int, duplicate_ratio: float = 0.0, invalid_ratio: float = 0.0, seed: int = 0, counts: dict = None):
+    # (field1, field2, field3). Un duplicado repite el contenido de una de las últimas
+    # RECENT filas válidas; una fila inválida lleva field2 no numérico (None en Parquet).
+    rng = random.Random(seed)
+    counts = counts if counts is not None else {}
+    counts.update(records=records, duplicates=0, invalid=0)
+    recent = deque(maxlen=RECENT)
+    for i in range(records):
+        roll = rng.random()
+        if roll < invalid_ratio:
+            counts["invalid"] += 1
+            yield f"value{i}", INVALID_FIELD2, "data"
+        elif recent and roll < invalid_ratio + duplicate_ratio:
+            counts["duplicates"] += 1
+            yield row(recent[rng.randrange(len(recent))])
+        else:
+            recent.append(i)
+            yield row(i)
+
+
+def _write_json(f, rows):
+    f.write("[")
+    first = True
+    for a, b, c in rows:
+        f.write(("" if first else ",\n") + json.dumps({"field1": a, "field2": b, "field3": c}))
+        first = False
+    f.write("]")
+
+
+def _write_ndjson(f, rows):
+    f.writelines(json.dumps({"field1": a, "field2": b, "field3": c}) + "\n" for a, b, c in rows)
+
+
+def _write_xml(f, rows):
+    f.write('<?xml version="1.0"?>\n<root>\n')
+    f.writelines(f"<record><field1>{a}</field1><field2>{b}</field2><field3>{c}</field3></record>\n" for a, b, c in rows)
+    f.write("</root>\n")
+
+
+def _write_csv(f, rows):
+    f.write("field1,field2,field3\n")
+    f.writelines(f"{a},{b},{c}\n" for a, b, c in rows)
+
+
+def _write_parquet(path, rows, group_size: int = 100000):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("field1", pa.string()), ("field2", pa.int64()), ("field3", pa.string())])
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            group = list(islice(rows, group_size))
+            if not group:
+                break
+            field1, field2, field3 = zip(*group)
+            field2 = [None if value == INVALID_FIELD2 else value for value in field2]
+            writer.write_table(pa.table({"field1": list(field1), "field2": field2, "field3": list(field3)}, schema=schema))
+
+
+WRITERS = {"json": _write_json, "ndjson": _write_ndjson, "xml": _write_xml, "csv": _write_csv}
+
+
+def generate(path: str, file_type: str, records: int, duplicate_ratio: float = 0.0, invalid_ratio: float = 0.0, seed: int = 0):
+    # Devuelve cuántas filas se escribieron de cada clase
+    counts = {}
+    rows = iter_rows(records, duplicate_ratio, invalid_ratio, seed, counts)
+    if file_type == "parquet":
+        _write_parquet(path, rows)
+    else:
+        with open(path, "w", buffering=1024 * 1024) as f:
+            WRITERS[file_type](f, rows)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Proporción de filas repetidas")
+    parser.add_argument("--invalid", type=float, default=0.0, help="Proporción de filas inválidas")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.path, args.format, args.records, args.duplicates, args.invalid, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
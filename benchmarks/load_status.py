@@ -0,0 +1,64 @@
+"""Prueba de carga de /status: latencias p50/p95/p99 con muchos clientes concurrentes.
+
+Uso: python -m benchmarks.load_status --url http://localhost:8000 --company acme --clients 500 --requests 10
+El servidor debe estar levantado (uvicorn backend.main:app) y la compañía tener datos.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+async def client_loop(client, path, requests, latencies, errors):
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args):
+    latencies, errors = [], []
+    path = f"/status/{args.company}?limit={args.limit}"
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, path, args.requests, latencies, errors) for _ in range(args.clients)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "clients": args.clients, "requests": len(latencies), "errors": len(errors),
+        "seconds": round(elapsed, 3), "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--company", default="bench_status")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10, help="Peticiones por cliente")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from backend import config
+from backend.pipeline import READERS, iter_batches
+from benchmarks.bench_ingest import check
+from benchmarks.datagen import generate
+
+@pytest.mark.parametrize("file_type", sorted(READERS))
+def test_generated_files_parse(tmp_path, monkeypatch, file_type):
+    monkeypatch.setattr(config, "PARSE_WORKERS", 1)
+    path = str(tmp_path / f"data.{file_type}")
+    counts = generate(path, file_type, 2000, duplicate_ratio=0.2, seed=1)
+    with open(path, "rb") as f:
+        rows = sum(len(batch["row_hash"]) for batch in iter_batches(f, file_type))
+    assert counts["duplicates"] > 300 and rows == 2000 - counts["duplicates"]
+
+    generate(path, file_type, 2000, invalid_ratio=0.01, seed=1)
+    with pytest.raises(ValueError, match=f"Invalid {READERS[file_type].label}"):
+        with open(path, "rb") as f:
+            for _ in iter_batches(f, file_type):
+                pass
+
+def test_check_reports_regressions():
+    result = {"stage": "parse", "format": "json", "records": 100000, "duplicate_ratio": 0.0, "invalid_ratio": 0.0,
+              "rows_per_sec": 70000, "stage_rss_mb": 40.0}
+    thresholds = {"min_records": 100000, "tolerance": 0.25, "stages": {"parse": {"min_rows_per_sec": 50000}, "parse.json": {"max_stage_rss_mb": 32}}}
+    baseline = {"results": [{**result, "rows_per_sec": 100000, "stage_rss_mb": 10.0}]}
+    assert check([result], thresholds, baseline) == [
+        "parse/json/100000: stage memory 40.0 MB > 32 MB",
+        "parse/json/100000: 70000 rows/sec, baseline 100000 (-25% allowed)",
+        "parse/json/100000: stage memory 40.0 MB, baseline 10.0 MB",
+    ]
+    assert check([{**result, "records": 1000}], thresholds, baseline) == ["parse/json/1000: stage memory 40.0 MB > 32 MB"]
+    assert check([{**result, "invalid_ratio": 0.1}], thresholds, baseline) == []
@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import csv
+import io
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from backend import config
+from backend.main import app
+from backend.database import get_db
+from backend.loader import bulk_load
+from backend.models.company_data import CompanyData
+from backend.models.company_status_summary import CompanyStatusSummary
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def clear_company(db, company_name):
+    # La base puede conservar las filas de una corrida anterior (row_hash es único por compañía)
+    db.execute(delete(CompanyData).where(CompanyData.company_name == company_name))
+    db.execute(delete(CompanyStatusSummary).where(CompanyStatusSummary.company_name == company_name))
+    db.commit()
+
+@pytest.fixture(scope="module")
+def exported_company():
+    db = next(get_db())
+    clear_company(db, "export_test")
+    records = [{"field1": f"value,{i}", "field2": i, "field3": "línea\nnueva"} for i in range(7)]
+    bulk_load(records, db, "export_test", status="processed", file_type="json")
+    bulk_load(records[:2], db, "export_test", status="staged", file_type="json")
+    db.commit()
+    yield records
+    clear_company(db, "export_test")
+    db.close()
+
+@pytest.mark.parametrize("format", ["csv", "ndjson", "parquet"])
+def test_export_formats(client, monkeypatch, exported_company, format):
+    # Bloques pequeños: la salida se arma a partir de varios bloques del cursor
+    monkeypatch.setattr(config, "EXPORT_CHUNK_SIZE", 3)
+    response = client.get(f"/export/export_test?format={format}")
+    assert response.status_code == 200
+    if format == "csv":
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+    elif format == "ndjson":
+        rows = [json.loads(line) for line in response.text.splitlines()]
+    else:
+        pq = pytest.importorskip("pyarrow.parquet")
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.num_rows == 7 and pq.ParquetFile(io.BytesIO(response.content)).num_row_groups == 3
+        rows = table.to_pylist()
+    # Las filas staged no se exportan
+    assert [(r["field1"], int(r["field2"]), r["field3"], r["status"]) for r in rows] == [
+        (r["field1"], r["field2"], r["field3"], "processed") for r in exported_company
+    ]
+
+def test_export_filters(client, exported_company):
+    response = client.get("/export/export_test", params={"format": "ndjson", "status": "staged"})
+    assert [json.loads(line)["field2"] for line in response.text.splitlines()] == [0, 1]
+    response = client.get("/export/export_test", params={"format": "ndjson", "created_after": "2999-01-01T00:00:00"})
+    assert response.text == ""
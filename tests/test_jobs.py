@@ -0,0 +1,497 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import pytest
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.database import get_db
+from backend.models.job import Job
+from backend.worker import claim_next_job, run_pending_jobs
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def disable_upload_cache(monkeypatch):
+    # Cada prueba procesa su upload aunque la base conserve jobs de corridas anteriores
+    from backend import config
+    monkeypatch.setattr(config, "UPLOAD_CACHE_TTL_SECONDS", 0)
+
+@pytest.fixture
+def db_session():
+    db = next(get_db())
+    yield db
+    db.rollback()
+
+valid_json = """{"records": [{"field1": "value1", "field2": 123, "field3": "data1"}, {"field1": "value2", "field2": 7, "field3": "data2"}]}"""
+invalid_json = """{"records": [{"field1": "value1", "field3": "data1"}]}"""
+
+def upload(client, company_name, content):
+    file = io.BytesIO(content.encode())
+    response = client.post(f"/process?company_name={company_name}", files={"file": ("test.json", file, "application/json")})
+    assert response.status_code == 200
+    return response.json()["job_id"]
+
+def test_job_lifecycle(client):
+    job_id = upload(client, "jobs_test", valid_json)
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["state"] == "queued"
+    assert job["bytes_received"] == len(valid_json)
+
+    run_pending_jobs()
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["state"] == "completed"
+    assert job["records_loaded"] == 2
+    assert job["started_at"] and job["finished_at"]
+
+def test_failed_job_reports_error(client):
+    job_id = upload(client, "jobs_failed_test", invalid_json)
+    run_pending_jobs()
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["state"] == "failed"
+    assert "Invalid JSON" in job["error"]
+
+def test_job_claimed_once(client, db_session):
+    job_id = upload(client, "jobs_claim_test", valid_json)
+    assert claim_next_job(db_session, "worker-a") == job_id
+    assert claim_next_job(db_session, "worker-b") is None
+    assert db_session.get(Job, job_id).worker == "worker-a"
+    # Se devuelve a la cola para no dejarlo colgado en otras pruebas
+    db_session.query(Job).filter(Job.id == job_id).update({"state": "queued", "worker": None})
+    db_session.commit()
+    run_pending_jobs()
+
+def test_unknown_job(client):
+    assert client.get("/jobs/999999999").status_code == 404
+
+def clear_company(db_session, company_name):
+    # Para las pruebas que cuentan filas, jobs o aciertos de caché: la base puede
+    # conservar datos de la compañía de una corrida anterior
+    from sqlalchemy import select
+    from backend.models.company_data import CompanyData
+    from backend.models.company_status_summary import CompanyStatusSummary
+    from backend.models.job_file import JobFile
+    jobs = select(Job.id).where(Job.company_name == company_name)
+    db_session.query(JobFile).filter(JobFile.job_id.in_(jobs)).delete(synchronize_session=False)
+    db_session.query(Job).filter(Job.company_name == company_name).delete(synchronize_session=False)
+    db_session.query(CompanyData).filter(CompanyData.company_name == company_name).delete(synchronize_session=False)
+    db_session.query(CompanyStatusSummary).filter(CompanyStatusSummary.company_name == company_name).delete(synchronize_session=False)
+    db_session.commit()
+
+def company_rows(db_session, company_name):
+    from backend.models.company_data import CompanyData
+    db_session.expire_all()
+    return db_session.query(CompanyData).filter(CompanyData.company_name == company_name).all()
+
+def test_reingestion_replaces_batch(client, db_session):
+    first = upload(client, "batch_test", valid_json)
+    run_pending_jobs()
+    second = upload(client, "batch_test", """[{"field1": "new", "field2": 1, "field3": "row"}]""")
+    run_pending_jobs()
+
+    rows = company_rows(db_session, "batch_test")
+    assert [(r.field1, r.status, r.batch_id) for r in rows] == [("new", "processed", second)]
+    assert client.get(f"/jobs/{first}").json()["state"] == "completed"
+
+def test_failed_batch_keeps_published_data(client, db_session):
+    upload(client, "batch_failed_test", valid_json)
+    run_pending_jobs()
+    failed = upload(client, "batch_failed_test", invalid_json)
+    run_pending_jobs()
+
+    rows = company_rows(db_session, "batch_failed_test")
+    assert sorted(r.field1 for r in rows if r.status == "processed") == ["value1", "value2"]
+    assert [r.batch_id for r in rows if r.status == "failed"] == [failed]
+    assert not [r for r in rows if r.status == "staged"]
+
+def test_older_batch_does_not_overwrite_newer(client, db_session):
+    from backend.worker import WORKER_ID, run_job
+    older = upload(client, "batch_order_test", valid_json)
+    newer = upload(client, "batch_order_test", """[{"field1": "new", "field2": 1, "field3": "row"}]""")
+    # El lote más reciente termina primero (ambos tomados por este worker)
+    db_session.query(Job).filter(Job.id.in_([older, newer])).update({"state": "running", "worker": WORKER_ID}, synchronize_session=False)
+    db_session.commit()
+    run_job(newer)
+    run_job(older)
+
+    rows = company_rows(db_session, "batch_order_test")
+    assert [(r.field1, r.batch_id) for r in rows] == [("new", newer)]
+    assert client.get(f"/jobs/{older}").json()["state"] == "superseded"
+
+def test_retried_job_replaces_previous_attempt(client, db_session, monkeypatch):
+    from backend.loader import bulk_load, promote_batch
+    from backend.models.company_status_summary import CompanyStatusSummary
+    from backend.pipeline import iter_records
+    from backend.routers import upload as upload_router
+    clear_company(db_session, "retry_test")
+    job_id = upload(client, "retry_test", valid_json)
+    # Primer intento: el worker cae con las filas staged confirmadas, antes de promoverlas
+    with monkeypatch.context() as patch:
+        patch.setattr(upload_router, "promote_batch", lambda db, company_name, batch_id: True)
+        upload_router.process_in_background("retry_test", io.BytesIO(valid_json.encode()), "json", batch_id=job_id)
+    # El reintento (mismo batch_id) y una segunda ejecución completa del job
+    assert not upload_router.process_in_background("retry_test", io.BytesIO(valid_json.encode()), "json", batch_id=job_id)["superseded"]
+    assert run_pending_jobs() == 1
+    assert client.get(f"/jobs/{job_id}").json()["state"] == "completed"
+    rows = company_rows(db_session, "retry_test")
+    assert sorted((r.field1, r.status, r.batch_id) for r in rows) == [("value1", "processed", job_id), ("value2", "processed", job_id)]
+
+    # Un intento anterior que perdió el lease y siguió cargando deja filas repetidas en el lote
+    retry_id = upload(client, "retry_test", """[{"field1": "new", "field2": 1, "field3": "row"}]""")
+    records = list(iter_records(io.BytesIO(b'[{"field1": "new", "field2": 1, "field3": "row"}]'), "json"))
+    for _ in range(2):
+        bulk_load(records, db_session, "retry_test", status="staged", batch_id=retry_id)
+        db_session.commit()
+    assert promote_batch(db_session, "retry_test", retry_id)
+    assert [(r.field1, r.status) for r in company_rows(db_session, "retry_test")] == [("new", "processed")]
+    db_session.query(Job).filter(Job.id == retry_id).update({"state": "completed"})
+    db_session.commit()
+
+    summary = db_session.query(CompanyStatusSummary).filter(CompanyStatusSummary.company_name == "retry_test").all()
+    assert {row.status: row.row_count for row in summary if row.row_count} == {"processed": 1}
+
+def test_merge_mode_skips_existing_rows(client, db_session):
+    upload(client, "merge_test", valid_json)
+    run_pending_jobs()
+    overlapping = """[{"field1": "value2", "field2": 7, "field3": "data2"}, {"field1": "value3", "field2": 9, "field3": "data3"}]"""
+    file = io.BytesIO(overlapping.encode())
+    response = client.post("/process?company_name=merge_test&mode=merge", files={"file": ("test.json", file, "application/json")})
+    job_id = response.json()["job_id"]
+    run_pending_jobs()
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["mode"] == "merge"
+    assert (job["records_loaded"], job["records_skipped"]) == (1, 1)
+    rows = company_rows(db_session, "merge_test")
+    assert sorted(r.field1 for r in rows) == ["value1", "value2", "value3"]
+    assert all(r.status == "processed" for r in rows)
+
+    # Un reemplazo posterior vuelve a dejar solo su contenido
+    upload(client, "merge_test", overlapping)
+    run_pending_jobs()
+    assert sorted(r.field1 for r in company_rows(db_session, "merge_test")) == ["value2", "value3"]
+
+def test_status_summary_tracks_batches(client, db_session):
+    from collections import Counter
+    from backend.worker import WORKER_ID, run_job
+
+    def check():
+        actual = Counter(r.status for r in company_rows(db_session, "summary_test") if r.status != "staged")
+        summary = client.get("/status/summary_test/summary").json()
+        assert summary["statuses"] == dict(actual)
+        assert summary["total"] == sum(actual.values())
+        return summary["statuses"]
+
+    clear_company(db_session, "summary_test")
+    assert client.get("/status/summary_test/summary").status_code == 404
+    upload(client, "summary_test", valid_json)
+    run_pending_jobs()
+    assert check() == {"processed": 2}
+
+    file = io.BytesIO("""[{"field1": "value3", "field2": 9, "field3": "data3"}]""".encode())
+    client.post("/process?company_name=summary_test&mode=merge", files={"file": ("test.json", file, "application/json")})
+    upload(client, "summary_test", invalid_json)
+    run_pending_jobs()
+    assert check() == {"processed": 3, "failed": 1}
+
+    # Lote reemplazado por uno más reciente y el reemplazo que lo supera
+    older = upload(client, "summary_test", valid_json)
+    newer = upload(client, "summary_test", """[{"field1": "new", "field2": 1, "field3": "row"}]""")
+    db_session.query(Job).filter(Job.id.in_([older, newer])).update({"state": "running", "worker": WORKER_ID}, synchronize_session=False)
+    db_session.commit()
+    run_job(newer)
+    run_job(older)
+    assert check() == {"processed": 1}
+
+def test_identical_upload_returns_cached_job(client, db_session, monkeypatch):
+    from backend import config
+    monkeypatch.setattr(config, "UPLOAD_CACHE_TTL_SECONDS", 3600)
+    # Sin jobs previos de la compañía que puedan responder desde la caché
+    clear_company(db_session, "cache_test")
+    content = """[{"field1": "cached", "field2": 1, "field3": "row"}]"""
+    before = client.get("/jobs/cache").json()
+
+    first = upload(client, "cache_test", content)
+    run_pending_jobs()
+    file = io.BytesIO(content.encode())
+    retry = client.post("/process?company_name=cache_test", files={"file": ("test.json", file, "application/json")}).json()
+    assert retry["cached"] is True
+    assert retry["job_id"] == first
+
+    # Otro contenido se procesa y deja de coincidir con el anterior
+    other = upload(client, "cache_test", valid_json)
+    assert other != first
+    run_pending_jobs()
+    assert upload(client, "cache_test", content) not in (first, other)
+    run_pending_jobs()
+
+    after = client.get("/jobs/cache").json()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 3
+
+def test_idempotency_key(client, monkeypatch):
+    import uuid
+    from backend import config
+    monkeypatch.setattr(config, "UPLOAD_CACHE_TTL_SECONDS", 3600)
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+
+    def post(content):
+        file = io.BytesIO(content.encode())
+        return client.post("/process?company_name=idempotency_test", files={"file": ("test.json", file, "application/json")}, headers=headers)
+
+    first = post(valid_json).json()
+    assert post(valid_json).json()["job_id"] == first["job_id"]
+    assert post(invalid_json).status_code == 409
+    # La misma clave con otro modo no devuelve el job de replace
+    response = client.post(
+        "/process?company_name=idempotency_test&mode=merge", files={"file": ("test.json", io.BytesIO(valid_json.encode()), "application/json")},
+        headers=headers,
+    )
+    assert response.status_code == 409
+    run_pending_jobs()
+
+    # Tras un fallo, reintentar con la misma clave vuelve a procesar
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    failed = post(invalid_json).json()["job_id"]
+    run_pending_jobs()
+    assert client.get(f"/jobs/{failed}").json()["state"] == "failed"
+    retry = post(invalid_json).json()
+    assert (retry["cached"], retry["job_id"] != failed) == (False, True)
+    assert post(invalid_json).json() == {**retry, "cached": True, "message": "Duplicate upload, returning previous job"}
+    run_pending_jobs()
+
+def test_concurrent_retries_enqueue_one_job(client, monkeypatch):
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+    from backend import config
+    monkeypatch.setattr(config, "UPLOAD_CACHE_TTL_SECONDS", 3600)
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+
+    def post(_):
+        file = io.BytesIO(valid_json.encode())
+        return client.post("/process?company_name=idempotency_race_test", files={"file": ("test.json", file, "application/json")}, headers=headers).json()
+
+    # Reintentos simultáneos tras un timeout: la búsqueda y la inserción son atómicas
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(post, range(4)))
+    assert len({response["job_id"] for response in responses}) == 1
+    assert sum(not response["cached"] for response in responses) == 1
+    run_pending_jobs()
+
+def make_archive(kind, members):
+    import tarfile
+    import zipfile
+    buffer = io.BytesIO()
+    if kind == "zip":
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+    else:
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for name, content in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content.encode())
+                archive.addfile(info, io.BytesIO(content.encode()))
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("kind, filename, workers", [("zip", "drop.zip", 1), ("tar", "drop.tar.gz", 2)])
+def test_archive_upload_reports_each_file(client, db_session, monkeypatch, kind, filename, workers):
+    from backend import config
+    monkeypatch.setattr(config, "PARSE_WORKERS", workers)
+    company = f"archive_{kind}_test"
+    content = make_archive(kind, {
+        "a.json": valid_json,
+        "dir/b.xml": "<root><record><field1>value3</field1><field2>3</field2><field3>data3</field3></record></root>",
+        # value1 ya viene en a.json y value4 se repite en el mismo archivo: se cuentan como leídas
+        "c.csv": "field1,field2,field3\nvalue1,123,data1\nvalue4,4,data4\nvalue4,4,data4\n",
+        "bad.json": invalid_json,
+        "notes.txt": "hola",
+        "__MACOSX/._a.json": "",
+    })
+    response = client.post(f"/process?company_name={company}", files={"file": (filename, io.BytesIO(content), "application/octet-stream")})
+    job_id = response.json()["job_id"]
+    run_pending_jobs()
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["state"] == "completed"
+    assert job["error"] == "2 of 5 files failed"
+    files = {f["name"]: f for f in job["files"]}
+    assert set(files) == {"a.json", "dir/b.xml", "c.csv", "bad.json", "notes.txt"}
+    assert (files["a.json"]["state"], files["a.json"]["records_loaded"]) == ("completed", 2)
+    assert (files["c.csv"]["records_read"], files["c.csv"]["records_loaded"], files["c.csv"]["records_skipped"]) == (3, 1, 2)
+    assert "Invalid JSON" in files["bad.json"]["error"]
+    assert files["notes.txt"]["error"] == "Unsupported file type"
+
+    rows = company_rows(db_session, company)
+    assert sorted((r.field1, r.file_type, r.status) for r in rows) == [
+        ("value1", "json", "processed"), ("value2", "json", "processed"), ("value3", "xml", "processed"),
+        ("value4", "csv", "processed"),
+    ]
+
+def test_multiple_file_parts(client, db_session):
+    clear_company(db_session, "parts_test")
+    parts = [
+        ("file", ("one.json", io.BytesIO(valid_json.encode()), "application/json")),
+        ("file", ("two", io.BytesIO(b'{"field1": "value9", "field2": 9, "field3": "data9"}\n'), "application/x-ndjson")),
+        ("file", ("more.zip", io.BytesIO(make_archive("zip", {"x.json": '[{"field1": "z", "field2": 1, "field3": "z"}]'})), "application/zip")),
+    ]
+    response = client.post("/process?company_name=parts_test&mode=merge", files=parts)
+    job_id = response.json()["job_id"]
+    run_pending_jobs()
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert (job["state"], job["records_loaded"], job["error"]) == ("completed", 4, None)
+    assert [f["name"] for f in job["files"]] == ["one.json", "two", "more.zip/x.json"]
+    assert sorted(r.field1 for r in company_rows(db_session, "parts_test")) == ["value1", "value2", "value9", "z"]
+
+def test_archive_without_valid_files_fails(client, db_session):
+    content = make_archive("zip", {"bad.json": invalid_json})
+    response = client.post("/process?company_name=archive_failed_test", files={"file": ("drop.zip", io.BytesIO(content), "application/zip")})
+    job_id = response.json()["job_id"]
+    run_pending_jobs()
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["state"] == "failed"
+    assert job["files"][0]["state"] == "failed"
+    assert not [r for r in company_rows(db_session, "archive_failed_test") if r.status != "failed"]
+
+def test_company_schema_upload(client, db_session):
+    company = "schema_jobs_test"
+    definition = {"fields": [
+        {"name": "sku", "column": "field1"},
+        {"name": "qty", "type": "int", "column": "field2"},
+        {"name": "warehouse", "required": False},
+    ]}
+    first = client.post(f"/schemas/{company}", json=definition).json()
+    second = client.post(f"/schemas/{company}", json={**definition, "extra": "ignore"}).json()
+    assert second["version"] == first["version"] + 1
+    assert client.get(f"/schemas/{company}").json()["extra"] == "ignore"
+    assert client.get(f"/schemas/{company}/{first['version']}").json()["extra"] == "allow"
+    assert client.post(f"/schemas/{company}", json={"fields": []}).status_code == 422
+
+    job_id = upload(client, company, '[{"sku": "A-1", "qty": "2", "warehouse": "north", "note": "x"}, {"sku": "A-2", "qty": 5}]')
+    run_pending_jobs()
+    job = client.get(f"/jobs/{job_id}").json()
+    assert (job["state"], job["records_loaded"], job["schema_version"]) == ("completed", 2, second["version"])
+    rows = sorted(company_rows(db_session, company), key=lambda r: r.field1)
+    assert [(r.field1, r.field2, r.field3, r.extra) for r in rows] == [("A-1", 2, "N/A", {"warehouse": "north"}), ("A-2", 5, "N/A", None)]
+    records = client.get(f"/status/{company}?fields=field1,extra").json()["records"]
+    assert {r["field1"]: r["extra"] for r in records} == {"A-1": {"warehouse": "north"}, "A-2": None}
+
+    job_id = upload(client, company, '[{"sku": "A-3", "qty": "many"}]')
+    run_pending_jobs()
+    assert "qty: Input should be a valid integer" in client.get(f"/jobs/{job_id}").json()["error"]
+
+def test_admission_budget(client, monkeypatch):
+    from backend import config
+    run_pending_jobs()
+    monkeypatch.setattr(config, "ADMISSION_COMPANY_MAX_JOBS", 1)
+    upload(client, "admission_test", valid_json)
+    response = client.post("/process?company_name=admission_test", files={"file": ("test.json", io.BytesIO(valid_json.encode()), "application/json")})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(config.ADMISSION_RETRY_AFTER_SECONDS)
+    # El presupuesto de una compañía no afecta a las demás
+    upload(client, "admission_other_test", valid_json)
+
+    budget = client.get("/jobs/budget").json()
+    assert budget["limits"]["company_max_jobs"] == 1
+    assert budget["companies"]["admission_test"] == {"jobs": 1, "bytes": len(valid_json), "running": 0, "uploading": 0}
+
+    # Bytes en vuelo: un archivo solo se admite siempre, el siguiente espera
+    monkeypatch.setattr(config, "ADMISSION_COMPANY_MAX_JOBS", 0)
+    monkeypatch.setattr(config, "ADMISSION_COMPANY_MAX_BYTES", len(valid_json) + 10)
+    response = client.post("/process?company_name=admission_test", files={"file": ("test.json", io.BytesIO(valid_json.encode()), "application/json")})
+    assert response.status_code == 429
+    run_pending_jobs()
+    upload(client, "admission_test", valid_json)
+    run_pending_jobs()
+
+def test_admission_reserves_uploads_in_progress(client, db_session, monkeypatch):
+    from datetime import datetime, timedelta
+    from backend import config
+    from backend.admission import release, reserve
+    from backend.models.upload_reservation import UploadReservation
+    run_pending_jobs()
+    db_session.query(UploadReservation).delete()
+    db_session.commit()
+    monkeypatch.setattr(config, "ADMISSION_COMPANY_MAX_BYTES", 1000)
+    # Un upload en curso de 900 bytes: cuenta como job en vuelo antes de encolarse
+    reservation_id = reserve(db_session, "reservation_test", 900)
+    budget = client.get("/jobs/budget").json()
+    assert budget["companies"]["reservation_test"] == {"jobs": 1, "bytes": 900, "running": 0, "uploading": 1}
+    assert "ingest_uploads_in_progress 1.0" in client.get("/metrics").text
+
+    # Se rechaza por Content-Length sin llegar a guardar el archivo
+    saved = []
+    with monkeypatch.context() as patch:
+        patch.setattr("backend.routers.upload.save_upload", lambda *args, **kwargs: saved.append(args))
+        response = client.post("/process?company_name=reservation_test", files={"file": ("test.json", io.BytesIO(valid_json.encode()), "application/json")})
+    assert response.status_code == 429
+    assert saved == []
+
+    # Un request que termina sin encolar libera su reserva
+    response = client.post("/process?company_name=other_reservation_test", files={"file": ("test.txt", io.BytesIO(b"hola"), "text/plain")})
+    assert response.status_code == 400
+    assert [r.id for r in db_session.query(UploadReservation)] == [reservation_id]
+
+    # Una reserva que no se liberó (proceso caído) expira
+    db_session.get(UploadReservation, reservation_id).created_at = datetime.utcnow() - timedelta(seconds=config.ADMISSION_RESERVATION_SECONDS + 1)
+    db_session.commit()
+    assert "reservation_test" not in client.get("/jobs/budget").json()["companies"]
+    release(db_session, reservation_id)
+    db_session.commit()
+
+    # Al encolar, la reserva del request pasa a ser el job
+    job_id = upload(client, "reservation_test", valid_json)
+    assert db_session.query(UploadReservation).count() == 0
+    assert client.get("/jobs/budget").json()["companies"]["reservation_test"]["uploading"] == 0
+    assert run_pending_jobs() == 1
+    assert client.get(f"/jobs/{job_id}").json()["state"] == "completed"
+
+def test_fair_claim_across_companies(client, db_session, monkeypatch):
+    from backend import config
+    from backend.worker import run_job
+    run_pending_jobs()
+    big = [upload(client, "fair_big_test", valid_json.replace("value1", f"value{i}")) for i in range(3)]
+    small = upload(client, "fair_small_test", valid_json)
+    # Con un job de fair_big en proceso, el de fair_small pasa antes que los más antiguos de fair_big
+    monkeypatch.setattr(config, "WORKER_COMPANY_MAX_RUNNING", 1)
+    claimed = [claim_next_job(db_session, "worker-fair") for _ in range(3)]
+    assert claimed == [big[0], small, None]
+    for job_id in claimed[:2]:
+        assert run_job(job_id, "worker-fair") == "completed"
+    monkeypatch.setattr(config, "WORKER_COMPANY_MAX_RUNNING", 0)
+    assert run_pending_jobs() == 2
+
+def test_stale_job_requeued_only_after_lease_expires(client, db_session, monkeypatch):
+    from datetime import datetime, timedelta
+    from backend import config
+    from backend.worker import requeue_stale_jobs, run_job
+    run_pending_jobs()
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", 60)
+    job_id = upload(client, "lease_test", valid_json)
+    assert claim_next_job(db_session, "worker-a") == job_id
+    job = db_session.get(Job, job_id)
+    # Job largo pero vivo: empezó hace rato y renovó el lease hace poco
+    job.started_at = datetime.utcnow() - timedelta(seconds=600)
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=5)
+    db_session.commit()
+    requeue_stale_jobs(db_session)
+    db_session.refresh(job)
+    assert (job.state, job.worker) == ("running", "worker-a")
+
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+    db_session.commit()
+    requeue_stale_jobs(db_session)
+    db_session.refresh(job)
+    assert (job.state, job.worker) == ("queued", None)
+
+    # El worker original ya no es dueño del job: su resultado se descarta y el
+    # archivo queda para el worker que lo tomó después
+    assert claim_next_job(db_session, "worker-b") == job_id
+    assert run_job(job_id, "worker-a") is None
+    db_session.refresh(job)
+    assert (job.state, job.worker) == ("running", "worker-b")
+    assert os.path.exists(job.file_path)
+    assert run_job(job_id, "worker-b") == "completed"
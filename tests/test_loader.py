@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import pandas as pd
+# Importar la aplicación registra los modelos y crea las tablas en la base de pruebas
+import backend.main  # noqa: F401
+from backend.database import get_db
+from backend.loader import bulk_load
+from backend.models.company_data import CompanyData
+
+@pytest.fixture
+def db_session():
+    db = next(get_db())
+    yield db
+    db.rollback()
+
+def test_bulk_load_in_chunks(db_session):
+    records = [{"field1": f"value{i}", "field2": i, "field3": "tab\there"} for i in range(25)]
+    stats = bulk_load(iter(records), db_session, "bulk_test", status="processed", file_type="json", chunk_size=10)
+    assert stats["rows"] == 25
+    assert stats["rows_per_sec"] > 0
+
+    rows = db_session.query(CompanyData).filter(CompanyData.company_name == "bulk_test").order_by(CompanyData.field2).all()
+    assert [r.field2 for r in rows] == list(range(25))
+    assert rows[3].field1 == "value3" and rows[3].field3 == "tab\there"
+    assert len({r.created_at for r in rows}) == 1, "Todas las filas de una carga comparten created_at"
+
+def test_bulk_load_dataframe(db_session):
+    df = pd.DataFrame([{"field1": "a", "field2": 1, "field3": "b"}, {"field1": "c", "field2": 2, "field3": "d"}])
+    stats = bulk_load(df, db_session, "bulk_df_test", status="processed", file_type="xml", chunk_size=1)
+    assert stats["rows"] == 2
+    assert db_session.query(CompanyData).filter(CompanyData.company_name == "bulk_df_test").count() == 2
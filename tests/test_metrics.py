@@ -0,0 +1,85 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from backend.main import app
+from backend import logging_setup
+from backend.logging_setup import configure_logging
+from backend.worker import run_pending_jobs
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def disable_upload_cache(monkeypatch):
+    from backend import config
+    monkeypatch.setattr(config, "UPLOAD_CACHE_TTL_SECONDS", 0)
+
+valid_json = """[{"field1": "value1", "field2": 1, "field3": "data1"}, {"field1": "value1", "field2": 1, "field3": "data1"},
+{"field1": "value2", "field2": 2, "field3": "data2"}]"""
+invalid_json = """[{"field1": "value1", "field2": "x", "field3": "data1"}]"""
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def upload(client, company_name, content):
+    response = client.post(f"/process?company_name={company_name}", files={"file": ("test.json", io.BytesIO(content.encode()), "application/json")})
+    assert response.status_code == 200
+    return response.json()["job_id"]
+
+def test_stage_metrics_per_job(client):
+    before = {stage: sample("ingest_stage_duration_seconds_count", stage=stage) for stage in ("receive", "validate", "transform", "delete", "load")}
+    validate_rows = sample("ingest_stage_rows_sum", stage="validate")
+    transform_rows = sample("ingest_stage_rows_sum", stage="transform")
+    received = sample("ingest_stage_bytes_sum", stage="receive")
+    completed = sample("ingest_jobs_finished_total", state="completed")
+
+    upload(client, "metrics_test", valid_json)
+    run_pending_jobs()
+
+    # Una observación por etapa y job, aunque la etapa se ejecute por bloques
+    for stage, count in before.items():
+        assert sample("ingest_stage_duration_seconds_count", stage=stage) == count + 1
+    assert sample("ingest_stage_rows_sum", stage="validate") == validate_rows + 3
+    assert sample("ingest_stage_rows_sum", stage="transform") == transform_rows + 2
+    assert sample("ingest_stage_bytes_sum", stage="receive") == received + len(valid_json)
+    assert sample("ingest_jobs_finished_total", state="completed") == completed + 1
+
+def test_stage_failures(client):
+    failures = sample("ingest_stage_failures_total", stage="validate")
+    failed = sample("ingest_jobs_finished_total", state="failed")
+    upload(client, "metrics_failed_test", invalid_json)
+    run_pending_jobs()
+    assert sample("ingest_stage_failures_total", stage="validate") == failures + 1
+    assert sample("ingest_jobs_finished_total", state="failed") == failed + 1
+
+def test_metrics_endpoint(client):
+    run_pending_jobs()
+    upload(client, "metrics_queue_test", valid_json)
+    client.get("/jobs/999999999")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "ingest_jobs_queued 1.0" in body
+    assert "ingest_jobs_running 0.0" in body
+    # Latencia por plantilla de ruta, no por URL
+    assert 'http_request_duration_seconds_count{method="GET",route="/jobs/{job_id}",status="404"}' in body
+    assert 'route="/process",status="200"' in body
+    run_pending_jobs()
+
+def test_queued_logging_creates_directory(tmp_path, monkeypatch):
+    # Configuración propia; al terminar se restaura la de la aplicación
+    monkeypatch.setattr(logging.getLogger(), "handlers", [])
+    monkeypatch.setattr(logging_setup, "_listener", None)
+    path = tmp_path / "logs" / "app.log"
+    configure_logging(str(path))
+    logging.getLogger("metrics_test").info("queued message")
+    logging_setup.stop_logging()
+    assert "queued message" in path.read_text()
@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+# Importar la aplicación registra todos los modelos en Base.metadata
+import backend.main  # noqa: F401
+from backend.database import Base
+from backend.migrations import upgrade_schema
+
+# Tabla company_data tal como la creaba la primera versión de la plataforma
+BASELINE_SCHEMA = [
+    """CREATE TABLE company_data (
+        id INTEGER NOT NULL PRIMARY KEY,
+        company_name VARCHAR,
+        file_type VARCHAR,
+        status VARCHAR,
+        created_at DATETIME,
+        field1 VARCHAR NOT NULL,
+        field2 INTEGER NOT NULL,
+        field3 VARCHAR NOT NULL
+    )""",
+    "CREATE INDEX ix_company_data_id ON company_data (id)",
+    "CREATE INDEX ix_company_data_company_name ON company_data (company_name)",
+]
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text(
+            "INSERT INTO company_data (company_name, status, field1, field2, field3) VALUES ('old', 'processed', 'a', 1, 'b')"
+        ))
+    yield engine
+    engine.dispose()
+
+def test_upgrade_from_baseline_schema(baseline_engine):
+    Base.metadata.create_all(bind=baseline_engine)
+    added = upgrade_schema(baseline_engine)
+    assert {"company_data.batch_id", "company_data.row_hash", "company_data.extra", "uq_company_data_row_hash"} <= set(added)
+
+    inspector = inspect(baseline_engine)
+    columns = {column["name"] for column in inspector.get_columns("company_data")}
+    assert {"batch_id", "row_hash", "extra"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("company_data")}
+    assert {"ix_company_data_company_id", "ix_company_data_company_status", "uq_company_data_row_hash"} <= indexes
+    # Idempotente: el siguiente arranque no cambia nada
+    assert upgrade_schema(baseline_engine) == []
+
+    with baseline_engine.begin() as connection:
+        assert connection.execute(text("SELECT field1, batch_id, row_hash FROM company_data")).all() == [("a", None, None)]
+        insert = text(
+            "INSERT INTO company_data (company_name, status, batch_id, field1, field2, field3, row_hash)"
+            " VALUES ('new', :status, 1, 'a', 1, 'b', 'h')"
+        )
+        connection.execute(insert, {"status": "staged"})
+        connection.execute(insert, {"status": "processed"})
+    # El índice único parcial vale para las filas publicadas
+    with pytest.raises(IntegrityError):
+        with baseline_engine.begin() as connection:
+            connection.execute(insert, {"status": "processed"})
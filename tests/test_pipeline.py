@@ -0,0 +1,255 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import pytest
+from backend import config
+from backend.pipeline import REQUIRED_FIELDS, detect_file_type, iter_records, row_hash
+
+def read(content, file_type):
+    records = list(iter_records(io.BytesIO(content.encode()), file_type))
+    assert all(r["row_hash"] == row_hash(r["field1"], r["field2"], r["field3"]) for r in records)
+    return [{field: r[field] for field in REQUIRED_FIELDS} for r in records]
+
+json_records = """{"meta": {"source": "erp"}, "records": [
+    {"field1": "value1", "field2": 123, "field3": "data1"},
+    {"field1": "value2", "field2": "45", "field3": "data2", "extra": [1, 2.5]},
+    {"field1": "value1", "field2": 123, "field3": "data1"}
+]}"""
+xml_records = """<?xml version="1.0"?><root>
+<record><field1>value1</field1><field2>123</field2><field3>data1</field3></record>
+<record><field1/><field2></field2><field3>data2</field3></record>
+</root>"""
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+def test_json_records_across_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr(config, "UPLOAD_CHUNK_SIZE", chunk_size)
+    records = read(json_records, "json")
+    # El duplicado se descarta y field2 se convierte a entero
+    assert records == [
+        {"field1": "value1", "field2": 123, "field3": "data1"},
+        {"field1": "value2", "field2": 45, "field3": "data2"},
+    ]
+
+def test_xml_records_fill_defaults():
+    records = read(xml_records, "xml")
+    assert records == [
+        {"field1": "value1", "field2": 123, "field3": "data1"},
+        {"field1": "N/A", "field2": 0, "field3": "data2"},
+    ]
+
+def test_duplicates_detected_after_normalization():
+    # La deduplicación compara las filas tal como se guardan (field1..3 normalizados),
+    # no el registro crudo como hacía drop_duplicates: 1 y "1" son la misma fila y los
+    # campos que no se guardan no las distinguen
+    records = read("""[
+        {"field1": "a", "field2": 1, "field3": "b"},
+        {"field1": "a", "field2": "1", "field3": "b"},
+        {"field1": "a", "field2": 1.0, "field3": "b", "note": "ignored"}
+    ]""", "json")
+    assert records == [{"field1": "a", "field2": 1, "field3": "b"}]
+    records = read("""<root>
+        <record><field1>a</field1><field2>1</field2><field3>b</field3><note>x</note></record>
+        <record><field1>a</field1><field2> 1</field2><field3>b</field3><note>y</note></record>
+        <record><field1/><field2/><field3>b</field3></record>
+        <record><field1>N/A</field1><field2>0</field2><field3>b</field3></record>
+    </root>""", "xml")
+    assert records == [{"field1": "a", "field2": 1, "field3": "b"}, {"field1": "N/A", "field2": 0, "field3": "b"}]
+
+@pytest.mark.parametrize("content, file_type, message", [
+    ('[{"field1": "value1", "field3": "data1"}]', "json", "Invalid JSON"),
+    ('[]', "json", "JSON body is empty"),
+    ('[{"field1": "value1", "field2": 1, "field3": "data1"},]', "json", "Invalid JSON"),
+    ('<root><record><field1>a</field1><field3>b</field3></record></root>', "xml", "Missing required fields"),
+    ('<root><record><field1>a</field1><field2>x</field2><field3>b</field3></record></root>', "xml", "Invalid field2 value"),
+    ('<root><record>', "xml", "Invalid XML"),
+])
+def test_invalid_content(content, file_type, message):
+    with pytest.raises(ValueError, match=message):
+        read(content, file_type)
+
+def test_validate_batch_reports_offending_rows():
+    from backend.pipeline import validate_batch
+    items = [
+        {"field1": "a", "field2": 1, "field3": "b"},
+        {"field1": "a", "field2": "1_000", "field3": "b"},
+        {"field1": "a", "field3": "b"},
+        {"field1": 5, "field2": 2.0, "field3": "b"},
+        {"field1": "a", "field2": 2.5, "field3": "b"},
+        "not a record",
+    ]
+    columns, errors = validate_batch(items, "json", offset=100)
+    assert errors == [
+        (102, "field2: Field required"),
+        (103, "field1: Input should be a valid string"),
+        (104, "field2: Input should be a valid integer"),
+        (105, "each record must be an object"),
+    ]
+    assert list(columns["field2"][:2]) == [1, 1000]
+
+    columns, errors = validate_batch([{"field1": None, "field2": " 7 ", "field3": "x"}, {"field1": "a", "field2": "7a", "field3": None}], "xml")
+    assert errors == [(1, "Invalid field2 value: 7a")]
+    assert (columns["field1"][0], columns["field2"][0]) == ("N/A", 7)
+
+def test_field2_integer_parsing_and_range():
+    from backend.pipeline import INT32_MAX, INT32_MIN, validate_batch
+    # Enteros con "_" y dígitos Unicode se guardan con su valor (antes de validar
+    # por columnas se validaban con int() pero se guardaban como 0)
+    columns, errors = validate_batch([{"field1": "a", "field2": "1_000", "field3": "b"}, {"field1": "a", "field2": "٣", "field3": "b"}], "xml")
+    assert errors == [] and list(columns["field2"]) == [1000, 3]
+
+    # Fuera del rango de la columna INTEGER: error del registro, no de la base al cargar
+    columns, errors = validate_batch([
+        {"field1": "a", "field2": INT32_MAX, "field3": "b"},
+        {"field1": "a", "field2": INT32_MAX + 1, "field3": "b"},
+        {"field1": "a", "field2": "99999999999999999999", "field3": "b"},
+        {"field1": "a", "field2": float(INT32_MIN), "field3": "b"},
+        {"field1": "a", "field2": -1e10, "field3": "b"},
+    ], "json", offset=10)
+    reason = f"field2: Input should be between {INT32_MIN} and {INT32_MAX}"
+    assert errors == [(11, reason), (12, reason), (14, reason)]
+    _, errors = validate_batch([{"field1": "a", "field2": "1", "field3": "b"}, {"field1": "a", "field2": " 2147483648 ", "field3": "b"}], "xml")
+    assert errors == [(1, f"Invalid field2 value:  2147483648  (Input should be between {INT32_MIN} and {INT32_MAX})")]
+    with pytest.raises(ValueError, match="Invalid JSON: field2: Input should be between"):
+        read('[{"field1": "a", "field2": 99999999999999999999, "field3": "b"}]', "json")
+
+def test_company_schema_validator():
+    import json
+    from backend.pipeline import validate_batch
+    from backend.schemas import SchemaSpec, SchemaVersion
+    spec = SchemaSpec(fields=[
+        {"name": "sku", "column": "field1"},
+        {"name": "qty", "type": "int", "column": "field2", "required": False, "default": 1},
+        {"name": "price", "type": "float", "strict": True},
+    ])
+    schema = SchemaVersion("schema_unit_test", 1, json.dumps(spec.model_dump(mode="json")))
+
+    columns, errors = validate_batch([
+        {"sku": "A-1", "qty": "3", "price": 9.5, "color": "red"},
+        {"sku": "A-2", "price": 2},
+    ], "json", schema=schema)
+    assert errors == []
+    assert (columns["field1"], columns["field2"], columns["field3"]) == (["A-1", "A-2"], [3, 1], ["N/A", "N/A"])
+    assert columns["extra"] == [{"price": 9.5, "color": "red"}, {"price": 2.0}]
+
+    # strict solo aplica a formatos con tipos: en CSV el texto se convierte
+    _, errors = validate_batch([{"sku": "A-3", "price": "9.5"}, {"qty": 2, "price": 1.0}], "json", offset=10, schema=schema)
+    assert errors == [(10, "price: Input should be a valid number"), (11, "sku: Field required")]
+    columns, errors = validate_batch([{"sku": "A-3", "qty": None, "price": "9.5"}], "csv", schema=schema)
+    assert errors == [] and columns["field2"] == [1] and columns["extra"] == [{"price": 9.5}]
+    _, errors = validate_batch([{"sku": "A-4", "qty": 2 ** 40, "price": 1.0}], "json", schema=schema)
+    assert errors == [(0, "qty: Input should be between -2147483648 and 2147483647")]
+
+@pytest.mark.parametrize("definition, message", [
+    ({"fields": [{"name": "a"}, {"name": "a"}]}, "unique"),
+    ({"fields": [{"name": "a", "type": "int", "column": "field1"}]}, "must be of type str"),
+    ({"fields": [{"name": "field2", "type": "int", "required": False}]}, "needs a default"),
+    ({"fields": [{"name": "a", "type": "int", "default": "x"}]}, "Default of a"),
+])
+def test_invalid_schema_definitions(definition, message):
+    from pydantic import ValidationError
+    from backend.schemas import SchemaSpec
+    with pytest.raises(ValidationError, match=message):
+        SchemaSpec.model_validate(definition)
+
+def read_file(path, file_type):
+    with open(path, "rb") as file_obj:
+        return [{field: r[field] for field in REQUIRED_FIELDS} for r in iter_records(file_obj, file_type)]
+
+@pytest.mark.parametrize("file_type, make", [
+    ("json", lambda rows: "[" + ",\n".join(rows) + "]"),
+    ("ndjson", lambda rows: "\n".join(rows) + "\n"),
+    ("json", lambda rows: '{"records": [' + ", ".join(rows) + "]}"),
+    ("xml", lambda rows: "<?xml version='1.0'?><root>" + "".join(rows) + "</root>"),
+])
+def test_parallel_matches_sequential(tmp_path, monkeypatch, file_type, make):
+    if file_type in ("json", "ndjson"):
+        # Un valor con "}, {" dentro fuerza el respaldo secuencial en ese rango
+        rows = [f'{{"field1": "v{i % 50}", "field2": {i % 50}, "field3": "{"}, {" if i == 150 else "d"}"}}' for i in range(400)]
+    else:
+        rows = [f"<record><field1>v{i % 50}</field1><field2>{i % 50}</field2><field3>d</field3></record>" for i in range(400)]
+    path = tmp_path / f"data.{file_type}"
+    path.write_text(make(rows))
+    expected = read_file(str(path), file_type)
+
+    monkeypatch.setattr(config, "PARSE_WORKERS", 2)
+    monkeypatch.setattr(config, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(config, "PARALLEL_CHUNK_BYTES", 512)
+    from backend.parallel import plan_ranges
+    with open(path, "rb") as file_obj:
+        assert len(plan_ranges(file_obj, file_type)["ranges"]) > 4
+    assert read_file(str(path), file_type) == expected
+    assert len(expected) == 50 if file_type == "xml" else len(expected) == 51
+
+    path.write_text(make(rows[:300] + [rows[0].replace("0", "x")] + rows[300:]))
+    with pytest.raises(ValueError, match="Invalid (JSON|NDJSON|XML)"):
+        read_file(str(path), file_type)
+    if file_type == "ndjson":
+        # El número de línea es absoluto aunque el error esté en un rango posterior
+        with pytest.raises(ValueError, match="line 301:"):
+            read_file(str(path), file_type)
+
+def test_parallel_nested_records_fall_back(tmp_path, monkeypatch, caplog):
+    from prometheus_client import REGISTRY
+    # Objetos y listas anidados: "}, {" aparece dentro de los registros y el
+    # corte de algún rango cae dentro de uno; el resultado no cambia
+    rows = [
+        f'{{"field1": "v{i}", "field2": {i}, "field3": "d", "meta": {{"tags": [{{"k": {i}}}, {{"k": "x}}, {{y"}}]}}, "items": [{{}}, {{"n": [1, {{}}]}}]}}'
+        for i in range(300)
+    ]
+    path = tmp_path / "nested.json"
+    path.write_text("[" + ", ".join(rows) + "]")
+    expected = read_file(str(path), "json")
+    assert len(expected) == 300
+
+    monkeypatch.setattr(config, "PARSE_WORKERS", 2)
+    monkeypatch.setattr(config, "PARALLEL_MIN_BYTES", path.stat().st_size // 2)
+    monkeypatch.setattr(config, "PARALLEL_CHUNK_BYTES", 1024)
+    fallbacks = REGISTRY.get_sample_value("ingest_parallel_fallbacks_total", {"file_type": "json"}) or 0
+    with caplog.at_level("WARNING", logger="backend.parallel"):
+        assert read_file(str(path), "json") == expected
+    assert REGISTRY.get_sample_value("ingest_parallel_fallbacks_total", {"file_type": "json"}) == fallbacks + 1
+    assert "continues sequentially" in caplog.text
+
+def test_ndjson_and_csv_records():
+    ndjson = '{"field1": "value1", "field2": 123, "field3": "data1"}\n\n{"field1": "value2", "field2": "45", "field3": "data2"}\n'
+    assert read(ndjson, "ndjson") == [
+        {"field1": "value1", "field2": 123, "field3": "data1"},
+        {"field1": "value2", "field2": 45, "field3": "data2"},
+    ]
+    # CSV sigue las reglas de XML: todo es texto y las celdas vacías toman valores por defecto
+    content = "\ufefffield3,field1,field2,extra\ndata1,value1,123,x\n,,,\n\"a,b\",value3,7,\n"
+    assert read(content, "csv") == [
+        {"field1": "value1", "field2": 123, "field3": "data1"},
+        {"field1": "N/A", "field2": 0, "field3": "N/A"},
+        {"field1": "value3", "field2": 7, "field3": "a,b"},
+    ]
+
+@pytest.mark.parametrize("content, file_type, message", [
+    ('{"field1": "a", "field2": 1, "field3": "b"}\n{"field1": ', "ndjson", "Invalid NDJSON: line 2:"),
+    ('{"field1": "a", "field3": "b"}\n', "ndjson", "Invalid NDJSON: 1 validation error"),
+    ("\n\n", "ndjson", "NDJSON body is empty"),
+    ("field1,field2,field3\na,x,b\n", "csv", "Invalid CSV: Invalid field2 value: x"),
+    ("field1,field3\na,b\n", "csv", "Invalid CSV: Missing required fields"),
+    ("field1,field2,field3\n", "csv", "CSV body is empty"),
+])
+def test_invalid_formats(content, file_type, message):
+    with pytest.raises(ValueError, match=message):
+        read(content, file_type)
+
+def test_parquet_row_groups():
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    table = pa.table({"field1": ["a", "b", "a"], "field2": [1, 2, 1], "field3": ["x", "y", "x"], "extra": [1.5, 2.5, 3.5]})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=2)
+    buffer.seek(0)
+    records = [{field: r[field] for field in REQUIRED_FIELDS} for r in iter_records(buffer, "parquet")]
+    assert records == [{"field1": "a", "field2": 1, "field3": "x"}, {"field1": "b", "field2": 2, "field3": "y"}]
+
+def test_detect_file_type():
+    assert detect_file_type("data.JSONL") == "ndjson"
+    assert detect_file_type("export.csv", "application/octet-stream") == "csv"
+    assert detect_file_type("upload.bin", "text/csv; charset=utf-8") == "csv"
+    assert detect_file_type("upload", "application/x-ndjson") == "ndjson"
+    assert detect_file_type("notes.txt", "text/plain") is None
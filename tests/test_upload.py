@@ -4,15 +4,21 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 import pytest
 import time
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
 from backend.main import app
 from backend.models.company_data import CompanyData
 from backend.database import get_db
+from backend.worker import run_pending_jobs
 
 @pytest.fixture
 def client():
     return TestClient(app)
 
+@pytest.fixture(autouse=True)
+def disable_upload_cache(monkeypatch):
+    # Cada prueba procesa su upload aunque la base conserve jobs de corridas anteriores
+    from backend import config
+    monkeypatch.setattr(config, "UPLOAD_CACHE_TTL_SECONDS", 0)
+
 @pytest.fixture
 def db_session():
     db = next(get_db())
@@ -22,6 +28,8 @@ def db_session():
 def wait_for_status(db_session, company_name, expected_status, timeout=12):
     start = time.time()
     while time.time() - start < timeout:
+        # Procesa en el proceso de la prueba los jobs que dejó /process
+        run_pending_jobs()
         records = db_session.query(CompanyData).filter(CompanyData.company_name == company_name).all()
         if records and all(r.status == expected_status for r in records):
             return True
@@ -38,7 +46,8 @@ def test_upload_valid_xml(client, db_session):
     file.name = "test.xml"
     response = client.post("/process?company_name=test_xml", files={"file": ("test.xml", file, "application/xml")})
     assert response.status_code == 200
-    assert response.json() == {"message": "Processing started in background"}
+    assert response.json()["message"] == "Processing queued"
+    assert isinstance(response.json()["job_id"], int)
     
     # Esperar a que el procesamiento termine
     assert wait_for_status(db_session, "test_xml", "processed"), "El archivo no fue procesado correctamente"
@@ -76,7 +85,8 @@ def test_upload_invalid_xml(client, db_session):
     file.name = "test.xml"
     response = client.post("/process?company_name=test_invalid_xml", files={"file": ("test.xml", file, "application/xml")})
     assert response.status_code == 200
-    assert response.json() == {"message": "Processing started in background"}
+    assert response.json()["message"] == "Processing queued"
+    assert isinstance(response.json()["job_id"], int)
     
     # Espera a que el status sea "failed" (o "error" si así lo maneja tu backend)
     failed = wait_for_status(db_session, "test_invalid_xml", "failed")
@@ -106,7 +116,8 @@ def test_upload_valid_json(client, db_session):
     file.name = "test.json"
     response = client.post("/process?company_name=test_json", files={"file": ("test.json", file, "application/json")})
     assert response.status_code == 200
-    assert response.json() == {"message": "Processing started in background"}
+    assert response.json()["message"] == "Processing queued"
+    assert isinstance(response.json()["job_id"], int)
     
     # Esperar a que el procesamiento termine
     assert wait_for_status(db_session, "test_json", "processed"), "El archivo no fue procesado correctamente"
@@ -144,7 +155,8 @@ def test_check_status(client, db_session):
     file.name = "test.json"
     response = client.post("/process?company_name=status_test", files={"file": ("test.json", file, "application/json")})
     assert response.status_code == 200
-    assert response.json() == {"message": "Processing started in background"}
+    assert response.json()["message"] == "Processing queued"
+    assert isinstance(response.json()["job_id"], int)
     
     # Esperar a que el procesamiento termine
     assert wait_for_status(db_session, "status_test", "processed"), "El archivo no fue procesado correctamente"
@@ -185,4 +197,126 @@ def test_check_status(client, db_session):
     print(f"     * field1: {record['field1']}")
     print(f"     * field2: {record['field2']}")
     print(f"     * field3: {record['field3']}")
-    print(f"     * file_type: {record.get('file_type', 'No especificado')}")
\ No newline at end of file
+    print(f"     * file_type: {record.get('file_type', 'No especificado')}")
+
+def test_upload_large_file_memory_bounded(tmp_path, monkeypatch):
+    import asyncio
+    import tracemalloc
+    from fastapi import UploadFile
+    from backend import config
+    from backend.routers import upload
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path / "uploads"))
+
+    # Archivo sintético de ~64 MB escrito por bloques
+    path = tmp_path / "large.json"
+    record = b'{"field1": "value1", "field2": 123, "field3": "data1"},'
+    with open(path, "wb") as f:
+        f.write(b'{"records": [')
+        for _ in range(64):
+            f.write(record * (1024 * 1024 // len(record)))
+        f.write(b'{"field1": "value1", "field2": 123, "field3": "data1"}]}')
+    file_size = path.stat().st_size
+
+    # Se invoca directamente el guardado del upload: el TestClient arma el body completo en memoria
+    tracemalloc.start()
+    with open(path, "rb") as f:
+        saved_path, size, _ = asyncio.run(upload.save_upload(UploadFile(file=f, filename="large.json")))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert size == file_size
+    assert os.path.getsize(saved_path) == file_size, "El archivo guardado no coincide con el enviado"
+    assert peak < 32 * 1024 * 1024, f"Memoria pico demasiado alta: {peak} bytes para un archivo de {file_size} bytes"
+    print(f"[MEMORIA] Archivo de {file_size} bytes, pico {peak} bytes")
+
+def test_upload_exceeds_max_size(client, monkeypatch, tmp_path):
+    import io
+    from backend import config
+    monkeypatch.setattr(config, "MAX_UPLOAD_BYTES", 16)
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path))
+    file = io.BytesIO(valid_json.encode())
+    response = client.post("/process?company_name=too_large", files={"file": ("test.json", file, "application/json")})
+    assert response.status_code == 413
+    assert os.listdir(tmp_path) == [], "El upload rechazado no debe quedar en disco"
+
+def test_status_pagination_and_streaming(client, db_session):
+    import io
+    import json
+    records = [{"field1": f"value{i}", "field2": i, "field3": "data"} for i in range(5)]
+    file = io.BytesIO(json.dumps({"records": records}).encode())
+    response = client.post("/process?company_name=paged_test", files={"file": ("test.json", file, "application/json")})
+    assert response.status_code == 200
+    assert wait_for_status(db_session, "paged_test", "processed"), "El archivo no fue procesado correctamente"
+
+    # Paginación por keyset con proyección de columnas
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 2, "fields": "field2,status"}
+        if after is not None:
+            params["after"] = after
+        data = client.get("/status/paged_test", params=params).json()
+        assert all(set(r) == {"id", "field2", "status"} for r in data["records"])
+        seen += [r["field2"] for r in data["records"]]
+        after = data["next_after"]
+        if after is None:
+            break
+    assert sorted(seen) == list(range(5))
+
+    # Filtro por estado
+    assert client.get("/status/paged_test", params={"status": "failed"}).status_code == 404
+    assert client.get("/status/paged_test", params={"fields": "nope"}).status_code == 400
+
+    # Modo NDJSON
+    response = client.get("/status/paged_test", params={"format": "ndjson", "fields": "field1"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["field1"] for line in lines) == [f"value{i}" for i in range(5)]
+
+def test_status_cache_and_etag(client, db_session):
+    import io
+    from backend import status_cache
+
+    def upload(value):
+        content = f'[{{"field1": "{value}", "field2": 1, "field3": "data"}}]'.encode()
+        file = io.BytesIO(content)
+        response = client.post("/process?company_name=etag_test", files={"file": ("test.json", file, "application/json")})
+        assert response.status_code == 200
+        assert wait_for_status(db_session, "etag_test", "processed"), "El archivo no fue procesado correctamente"
+
+    upload("first")
+    first = client.get("/status/etag_test")
+    etag = first.headers["etag"]
+    before = status_cache.cache_stats()
+    # La misma versión se sirve desde la caché y con If-None-Match no se envía cuerpo
+    assert client.get("/status/etag_test").content == first.content
+    assert client.get("/status/etag_test", headers={"If-None-Match": etag}).status_code == 304
+    stats = status_cache.cache_stats()
+    assert stats["hits"] == before["hits"] + 1
+    assert stats["not_modified"] == before["not_modified"] + 1
+    assert stats["bytes_saved"] == before["bytes_saved"] + 2 * len(first.content)
+
+    # Sin datos la respuesta es 404 aunque el ETag coincida
+    assert client.get("/status/etag_unknown_test", headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get("/status/etag_test", params={"status": "failed"}, headers={"If-None-Match": "*"}).status_code == 404
+
+    # Una nueva ingesta cambia la versión: otro ETag y los datos nuevos
+    upload("second")
+    response = client.get("/status/etag_test", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [r["field1"] for r in response.json()["records"]] == ["second"]
+
+def test_upload_csv_by_content_type(client, db_session):
+    import io
+    content = "field1,field2,field3\ncsv1,1,data\ncsv2,2,\n"
+    file = io.BytesIO(content.encode())
+    response = client.post("/process?company_name=csv_test", files={"file": ("export", file, "text/csv")})
+    assert response.status_code == 200
+    assert wait_for_status(db_session, "csv_test", "processed"), "El archivo no fue procesado correctamente"
+    records = db_session.query(CompanyData).filter(CompanyData.company_name == "csv_test").order_by(CompanyData.field2).all()
+    assert [(r.field1, r.field2, r.field3, r.file_type) for r in records] == [("csv1", 1, "data", "csv"), ("csv2", 2, "N/A", "csv")]
+
+    file = io.BytesIO(content.encode())
+    response = client.post("/process?company_name=csv_test", files={"file": ("notes.txt", file, "text/plain")})
+    assert response.status_code == 400
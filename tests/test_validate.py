@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import pytest
+from fastapi.testclient import TestClient
+from backend import config
+from backend.main import app
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def record(i, field2=None):
+    return {"field1": f"value{i}", "field2": i if field2 is None else field2, "field3": "data"}
+
+def validate(client, body, content_type, **params):
+    return client.post("/validate", params=params, content=body, headers={"Content-Type": content_type})
+
+@pytest.mark.parametrize("body, content_type, records", [
+    (json.dumps({"records": [record(1), record(2)]}), "application/json", 2),
+    (json.dumps(record(1)), "application/json", 1),
+    ("\n".join(json.dumps(record(i)) for i in range(3)) + "\n", "application/x-ndjson", 3),
+    ("<root><record><field1>a</field1><field2>1</field2><field3/></record></root>", "application/xml", 1),
+    ('field1,field2,field3\n"a\nb",1,c\n', "text/csv", 1),
+])
+def test_validate_valid_bodies(client, body, content_type, records):
+    response = validate(client, body, content_type)
+    assert response.status_code == 200, response.text
+    assert response.json()["records"] == records
+
+def test_validate_reports_record_offsets(client, monkeypatch):
+    monkeypatch.setattr(config, "RECORD_BATCH_SIZE", 4)
+    items = [record(i) for i in range(10)]
+    items[2]["field2"] = "x"
+    del items[7]["field3"]
+    response = validate(client, json.dumps(items), "application/json")
+    assert response.status_code == 400
+    data = response.json()
+    assert data["errors"] == [
+        {"record": 2, "error": "field2: Input should be a valid integer"},
+        {"record": 7, "error": "field3: Field required"},
+    ]
+    assert data["detail"] == "Invalid JSON: field2: Input should be a valid integer"
+    assert (data["records_checked"], data["stopped_early"]) == (10, False)
+
+def test_validate_stops_after_max_errors(client, monkeypatch):
+    monkeypatch.setattr(config, "RECORD_BATCH_SIZE", 2)
+    chunks = [(json.dumps(record(i, "bad")) + "\n").encode() for i in range(1000)]
+    response = validate(client, iter(chunks), "application/x-ndjson", max_errors=3)
+    data = response.json()
+    assert [error["record"] for error in data["errors"]] == [0, 1, 2]
+    assert data["stopped_early"] and data["records_checked"] < 1000
+
+def test_validate_xml_records_and_syntax(client):
+    # Los errores de registros ya leídos se informan antes que el error de sintaxis
+    response = validate(client, "<root><record><field1>a</field1><field2>x</field2><field3>b</field3></record>", "application/xml")
+    errors = response.json()["errors"]
+    assert errors[0] == {"record": 0, "error": "Invalid field2 value: x"}
+    assert errors[1]["record"] == 1 and errors[1]["error"].startswith("Premature end of data")
+
+    response = validate(client, '[{"field1": "a", "field2": 1, "field3": "b"}, {"field1": ', "application/json")
+    assert response.json()["errors"] == [{"record": 1, "error": "Expecting value: char 57"}]
+
+@pytest.mark.parametrize("body, content_type, status", [
+    ("", "application/json", 400),
+    ("   ", "application/xml", 400),
+    ("a,b", "text/plain", 415),
+    ("x" * 100, "application/json", 413),
+])
+def test_validate_rejected_bodies(client, monkeypatch, body, content_type, status):
+    monkeypatch.setattr(config, "VALIDATE_MAX_BYTES", 64)
+    assert validate(client, body, content_type).status_code == status
+
+def test_validate_with_company_schema(client):
+    company = "validate_schema_test"
+    client.post(f"/schemas/{company}", json={"fields": [{"name": "sku", "column": "field1"}, {"name": "qty", "type": "int"}]})
+    body = "sku,qty\nA-1,3\nA-2,\n"
+    assert validate(client, body, "text/csv").status_code == 400
+    response = validate(client, body, "text/csv", company_name=company)
+    assert response.json()["errors"] == [{"record": 1, "error": "qty: Field required"}]